@@ -0,0 +1,185 @@
+"""
+Subscription entitlements.
+
+Each user's current subscription is one Entitlement row (plan, reveal
+limit, expires_at, status), written by grant_entitlement() in the same
+transaction that marks the payment successful. Readers look it up by
+primary key instead of searching SubscriptionPayment for the latest
+successful payment.
+
+The subscription expiry is additionally cached in two layers:
+
+- a small per-process LRU dict (ENTITLEMENT_LOCAL_TIMEOUT, at most
+  ENTITLEMENT_LOCAL_MAX_SIZE users)
+- the Django cache / Redis (ENTITLEMENT_CACHE_TIMEOUT)
+
+Since the cached value is the expiry itself, a subscription lapses on
+time even without an invalidation. Anything that changes a user's
+entitlement (payment verification, the expiry task) calls
+invalidate_entitlement() / invalidate_entitlements(), which clear both
+layers and notify the user's `presence_<id>` channel group so open chat
+sockets refresh.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from chat.events import presence_group_name, send_group_events
+from .models import Entitlement
+
+ENTITLEMENT_CACHE_TIMEOUT = 60 * 60
+ENTITLEMENT_LOCAL_TIMEOUT = 30
+ENTITLEMENT_LOCAL_MAX_SIZE = 10000
+
+# Cached stand-in for "no active subscription" (None means a cache miss)
+NOT_SUBSCRIBED = 0
+
+# user_id → (expiry, valid until), least recently used first
+_local_cache = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def entitlement_cache_key(user_id):
+    return f"entitlement_{user_id}"
+
+
+def subscription_expiries(user_ids):
+    """
+    {user_id: expiry} for the users with an active, non-expired
+    subscription. One query for all users.
+    """
+    return dict(
+        Entitlement.objects
+        .filter(
+            user_id__in=user_ids,
+            status="active",
+            expires_at__gt=timezone.now()
+        )
+        .values_list("user_id", "expires_at")
+    )
+
+
+def get_entitlement(user_id):
+    """
+    The user's Entitlement (active or not) with its plan, or None if they
+    never subscribed
+    """
+    return (
+        Entitlement.objects
+        .select_related("plan")
+        .filter(user_id=user_id)
+        .first()
+    )
+
+
+def grant_entitlement(payment):
+    """
+    Make a successful payment the user's current entitlement. Call inside
+    the transaction that marks the payment successful.
+    """
+    plan = payment.subscription
+
+    entitlement, _ = Entitlement.objects.update_or_create(
+        user_id=payment.user_id,
+        defaults={
+            "plan": plan,
+            "payment": payment,
+            "reveal_limit": plan.reveal_limit,
+            "expires_at": payment.expires_at,
+            "status": "active",
+        }
+    )
+
+    invalidate_entitlement(payment.user_id)
+    return entitlement
+
+
+def get_local_entitlement(user_id):
+    """
+    The locally cached expiry, or None if missing or stale
+    """
+    with _local_lock:
+        local = _local_cache.get(user_id)
+        if local is None:
+            return None
+
+        if local[1] <= time.monotonic():
+            del _local_cache[user_id]
+            return None
+
+        _local_cache.move_to_end(user_id)
+        return local[0]
+
+
+def set_local_entitlement(user_id, expiry):
+    with _local_lock:
+        _local_cache[user_id] = (expiry, time.monotonic() + ENTITLEMENT_LOCAL_TIMEOUT)
+        _local_cache.move_to_end(user_id)
+
+        # 🔹 Evict the least recently used (stale entries drop out on read)
+        while len(_local_cache) > ENTITLEMENT_LOCAL_MAX_SIZE:
+            _local_cache.popitem(last=False)
+
+
+def get_subscription_expiry(user_id):
+    """
+    Expiry of the user's active subscription, or None (cached)
+    """
+    expiry = get_local_entitlement(user_id)
+
+    if expiry is None:
+        expiry = cache.get(entitlement_cache_key(user_id))
+
+        if expiry is None:
+            expiry = subscription_expiries([user_id]).get(user_id, NOT_SUBSCRIBED)
+            cache.set(entitlement_cache_key(user_id), expiry, ENTITLEMENT_CACHE_TIMEOUT)
+
+        set_local_entitlement(user_id, expiry)
+
+    return expiry or None
+
+
+def is_subscription_active(expiry):
+    return expiry is not None and expiry > timezone.now()
+
+
+def is_user_subscribed(user):
+    return is_subscription_active(get_subscription_expiry(user.id))
+
+
+def forget_local_entitlement(user_id):
+    with _local_lock:
+        _local_cache.pop(user_id, None)
+
+
+def invalidate_entitlement(user_id):
+    """
+    Drop the cached entitlement once the current transaction commits and
+    tell open chat sockets to reload it.
+    """
+    invalidate_entitlements([user_id])
+
+
+def invalidate_entitlements(user_ids):
+    """
+    invalidate_entitlement() for many users: one cache round trip, then
+    one event per user
+    """
+    user_ids = list(user_ids)
+
+    def invalidate():
+        for user_id in user_ids:
+            forget_local_entitlement(user_id)
+        cache.delete_many([entitlement_cache_key(user_id) for user_id in user_ids])
+
+        send_group_events([
+            (presence_group_name(user_id), {"type": "entitlement_changed", "user_id": user_id})
+            for user_id in user_ids
+        ])
+
+    if user_ids:
+        transaction.on_commit(invalidate)
@@ -0,0 +1,213 @@
+"""
+Resized variants of profile and gallery photos.
+
+Phones upload multi-megabyte photos, while the feed and chat list show
+them as small avatars. Whenever a new photo is saved, the
+generate_image_variants task writes resized WebP copies next to it:
+
+- thumb   200x200, cropped to a square (avatars in the feed / chat list)
+- medium  fits in 640x640 (profile page)
+- large   fits in 1600x1600 (full-screen gallery)
+
+The copies are recorded on the row in <field>_variants, e.g.
+profile_image_variants = {"source": "profile_images/a.jpg",
+"thumb": "profile_images/a.thumb.webp", ...}. "source" ties them to the
+upload they were made from, so a replaced photo is never shown through
+its predecessor's variants. Until the task has run, ImageVariantField
+and image_variant() fall back to the original. Only the task writes
+<field>_variants: ordinary saves leave it out (ImageVariantsMixin), so
+an instance loaded before the task ran can't put back a stale value.
+
+Variants are deleted with their row and counted as referenced by
+reconcile_media (see auth_api.media).
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from .media import queue_media_deletion, variant_names, variants_field_name
+from .models import CustomUser, UserImage
+
+logger = logging.getLogger(__name__)
+
+# name: (width, height, crop)
+IMAGE_VARIANTS = {
+    "thumb": (200, 200, True),
+    "medium": (640, 640, False),
+    "large": (1600, 1600, False),
+}
+
+IMAGE_VARIANT_QUALITY = 80
+
+# Models whose image field gets variants
+VARIANT_FIELDS = {
+    CustomUser: "profile_image",
+    UserImage: "image",
+}
+
+
+def image_variant(file, variant):
+    """
+    The stored `variant` of an image field file, or the file itself if
+    it has none (yet)
+    """
+    if not file:
+        return file
+
+    variants = getattr(file.instance, variants_field_name(file.field.name), None) or {}
+    name = variants.get(variant)
+
+    if not name or variants.get("source") != file.name:
+        return file
+
+    return type(file)(file.instance, file.field, name)
+
+
+class ImageVariantField(serializers.ImageField):
+    """
+    Read-only URL of a resized variant of an image field
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return super().to_representation(image_variant(value, self.variant))
+
+
+def variant_path(source, variant):
+    # profile_images/a.jpg → profile_images/a.thumb.webp
+    root, _ = os.path.splitext(source)
+    return f"{root}.{variant}.webp"
+
+
+def render_variant(image, width, height, crop):
+    if crop:
+        resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    resized.save(buffer, "WEBP", quality=IMAGE_VARIANT_QUALITY, method=4)
+    return ContentFile(buffer.getvalue())
+
+
+def open_image(name):
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        # Phone photos are often stored sideways with an EXIF rotation
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def generate_variants(model, pk):
+    """
+    Write the variants of one row's image. Returns True if the row was
+    updated.
+    """
+    field_name = VARIANT_FIELDS[model]
+    variants_field = variants_field_name(field_name)
+
+    instance = (
+        model._default_manager
+        .filter(pk=pk)
+        .only("pk", field_name, variants_field)
+        .first()
+    )
+    if instance is None:
+        return False
+
+    source = getattr(instance, field_name).name
+    current = getattr(instance, variants_field) or {}
+
+    if not source or current.get("source") == source:
+        return False
+
+    variants = {"source": source}
+
+    try:
+        image = open_image(source)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # 🔹 Missing, truncated or corrupt: not retried, the original is shown instead
+        logger.warning("No variants for %s: %s", source, e)
+    else:
+        for variant, (width, height, crop) in IMAGE_VARIANTS.items():
+            variants[variant] = default_storage.save(
+                variant_path(source, variant),
+                render_variant(image, width, height, crop)
+            )
+
+    with transaction.atomic():
+        # Only if the photo wasn't replaced meanwhile
+        updated = (
+            model._default_manager
+            .filter(pk=pk, **{field_name: source})
+            .update(**{variants_field: variants})
+        )
+
+        stale = current if updated else variants
+        queue_media_deletion(variant_names(stale))
+
+    return bool(updated)
+
+
+def schedule_variants(model, pks):
+    """
+    Generate variants for the given rows once the transaction commits
+    """
+    from .tasks import generate_image_variants
+
+    pks = list(pks)
+    if not pks:
+        return
+
+    def schedule():
+        try:
+            generate_image_variants.delay(model._meta.label, pks)
+        except Exception:
+            logger.exception("Could not queue image variants for %s %s", model._meta.label, pks)
+
+    transaction.on_commit(schedule)
+
+
+def schedule_stale_variants(instance, update_fields=None):
+    """
+    post_save hook: schedule variants if the row's image changed
+    """
+    field_name = VARIANT_FIELDS.get(type(instance))
+    if field_name is None:
+        return
+
+    if update_fields is not None and field_name not in update_fields:
+        return
+    if field_name in instance.get_deferred_fields():
+        return
+
+    source = getattr(instance, field_name).name
+    variants = getattr(instance, variants_field_name(field_name), None) or {}
+
+    if not source or variants.get("source") == source:
+        return
+
+    # 🔹 The instance may predate the task that wrote the variants
+    current = (
+        type(instance)._default_manager
+        .filter(pk=instance.pk)
+        .values_list(variants_field_name(field_name), flat=True)
+        .first()
+    ) or {}
+
+    if current.get("source") != source:
+        schedule_variants(type(instance), [instance.pk])
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from auth_api.images import VARIANT_FIELDS, generate_variants, schedule_variants
+from auth_api.media import variants_field_name
+
+
+class Command(BaseCommand):
+    help = "Create resized variants for photos uploaded before they existed (or whose variants are stale)"
+
+    BATCH_SIZE = 100
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--now",
+            action="store_true",
+            help="Generate in this process instead of queueing Celery tasks"
+        )
+
+    def handle(self, *args, **options):
+        for model, field_name in VARIANT_FIELDS.items():
+            rows = (
+                model._default_manager
+                .exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__isnull": True})
+                .values_list("pk", field_name, variants_field_name(field_name))
+                .order_by("pk")
+            )
+
+            stale = [
+                pk
+                for pk, source, variants in rows.iterator(chunk_size=2000)
+                if (variants or {}).get("source") != source
+            ]
+
+            for start in range(0, len(stale), self.BATCH_SIZE):
+                batch = stale[start:start + self.BATCH_SIZE]
+
+                if options["now"]:
+                    for pk in batch:
+                        generate_variants(model, pk)
+                else:
+                    schedule_variants(model, batch)
+
+            action = "Generated" if options["now"] else "Queued"
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {model._meta.label}: {action} variants for {len(stale)} photos"
+            ))
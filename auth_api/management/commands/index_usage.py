@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from auth_api.models import MatrimonyProfile
+from match.models import MatchExclusion, MatchFeedEntry
+
+
+class Command(BaseCommand):
+    help = "Report index usage from pg_stat_user_indexes for the match feed tables"
+
+    DEFAULT_MODELS = (MatrimonyProfile, MatchFeedEntry, MatchExclusion)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--table",
+            action="append",
+            dest="tables",
+            help="Table to report on (repeatable). Defaults to the match feed tables."
+        )
+        parser.add_argument(
+            "--unused",
+            action="store_true",
+            help="Only show indexes that have never been scanned"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Index usage statistics are only available on PostgreSQL")
+
+        tables = options["tables"] or [m._meta.db_table for m in self.DEFAULT_MODELS]
+
+        sql = """
+            SELECT
+                s.relname,
+                s.indexrelname,
+                s.idx_scan,
+                s.idx_tup_read,
+                s.idx_tup_fetch,
+                pg_size_pretty(pg_relation_size(s.indexrelid))
+            FROM pg_stat_user_indexes s
+            WHERE s.relname = ANY(%s)
+        """
+        if options["unused"]:
+            sql += " AND s.idx_scan = 0"
+        sql += " ORDER BY s.relname, s.idx_scan DESC"
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tables])
+            rows = cursor.fetchall()
+
+        if not rows:
+            self.stdout.write("No index statistics found")
+            return
+
+        header = ("table", "index", "scans", "tuples read", "tuples fetched", "size")
+        widths = [
+            max(len(str(value)) for value in column)
+            for column in zip(header, *rows)
+        ]
+
+        for row in (header, *rows):
+            self.stdout.write("  ".join(
+                str(value).ljust(width) for value, width in zip(row, widths)
+            ))
+
+        # 🔹 Counters are cumulative since the last pg_stat_reset()
+        unused = [row[1] for row in rows if row[2] == 0]
+        if unused:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Never scanned: {', '.join(unused)}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ All listed indexes have been scanned"))
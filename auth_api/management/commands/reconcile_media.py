@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from auth_api.media import GC_MEDIA_DIRS, ORPHAN_MIN_AGE, orphaned_media, queue_media_deletion
+
+
+class Command(BaseCommand):
+    help = f"Find files under MEDIA_ROOT ({', '.join(GC_MEDIA_DIRS)}) that no row references"
+
+    BATCH_SIZE = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Queue the orphaned files for the media purge (default: only report them)"
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=ORPHAN_MIN_AGE,
+            help="Skip files modified in the last N seconds (uploads in flight)"
+        )
+
+    def handle(self, *args, **options):
+        count = 0
+        total_size = 0
+        batch = []
+
+        for name, size in orphaned_media(options["min_age"]):
+            count += 1
+            total_size += size
+
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {name} ({size} bytes)")
+
+            if options["delete"]:
+                batch.append(name)
+                if len(batch) >= self.BATCH_SIZE:
+                    queue_media_deletion(batch)
+                    batch = []
+
+        if batch:
+            queue_media_deletion(batch)
+
+        size_mb = total_size / (1024 * 1024)
+
+        if not count:
+            self.stdout.write(self.style.SUCCESS("✅ No orphaned media files"))
+        elif options["delete"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Queued {count} orphaned files ({size_mb:.1f} MB) for deletion"
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {count} orphaned files ({size_mb:.1f} MB), rerun with --delete to reclaim them"
+            ))
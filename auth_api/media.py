@@ -0,0 +1,212 @@
+"""
+Garbage collection of uploaded media.
+
+Deleting a row never touches its files on the spot. Instead, the
+post_delete receivers in auth_api.signals queue the file names as
+MediaDeletion rows, in the same transaction as the delete: a rolled back
+delete queues nothing, and a committed one can't lose its files. This
+covers every way the rows go (API views, admin pages, cascades and the
+hard delete job).
+
+The purge_deleted_media task unlinks queued files in batches. It is
+scheduled when a deletion commits, and Celery beat runs it as a
+backstop.
+
+Files that were never queued (replaced uploads, failed requests, older
+deletes) are found by the reconcile_media command, which compares the
+GC_MEDIA_DIRS under MEDIA_ROOT with the names stored in every file
+field and its resized variants.
+"""
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+
+from .models import MediaDeletion
+
+logger = logging.getLogger(__name__)
+
+MEDIA_PURGE_BATCH_SIZE = 500
+MEDIA_PURGE_MAX_ATTEMPTS = 5
+
+MEDIA_PURGE_LOCK = "media_purge"
+MEDIA_PURGE_LOCK_TIMEOUT = 60
+
+# Upload directories owned by user content (reconcile_media only looks here)
+GC_MEDIA_DIRS = (
+    "user_images",
+    "profile_images",
+    "success_stories",
+    "aadhaar_cards",
+)
+
+# Files younger than this may belong to an upload that hasn't committed
+ORPHAN_MIN_AGE = 60 * 60 * 24
+
+
+def variants_field_name(field_name):
+    # profile_image → profile_image_variants (see auth_api.images)
+    return f"{field_name}_variants"
+
+
+def variant_names(variants):
+    """
+    Stored names in a variants dict ({"source": original, variant: name})
+    """
+    return [name for key, name in (variants or {}).items() if key != "source"]
+
+
+def stored_media(instance):
+    """
+    Every stored file of a row: its file fields and their variants
+    """
+    names = []
+
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            names.append(getattr(instance, field.name).name)
+            names.extend(variant_names(
+                getattr(instance, variants_field_name(field.name), None)
+            ))
+
+    return names
+
+
+def queue_media_deletion(names):
+    """
+    Queue stored files for unlinking. Call inside the transaction that
+    deletes their rows.
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+
+    MediaDeletion.objects.bulk_create(
+        [MediaDeletion(name=name) for name in names],
+        ignore_conflicts=True
+    )
+    transaction.on_commit(schedule_media_purge)
+
+
+def schedule_media_purge():
+    from .tasks import purge_deleted_media
+
+    # Deletions committed before the purge starts share one run
+    if not cache.add(MEDIA_PURGE_LOCK, True, MEDIA_PURGE_LOCK_TIMEOUT):
+        return
+
+    try:
+        purge_deleted_media.apply_async(countdown=5)
+    except Exception:
+        logger.exception("Could not queue media purge")
+
+
+def purge_batch(batch_size=MEDIA_PURGE_BATCH_SIZE):
+    """
+    Unlink one batch of queued files. Returns the number of queue rows
+    handled.
+    """
+    with transaction.atomic():
+        queued = list(
+            MediaDeletion.objects
+            .select_for_update(skip_locked=True)
+            .filter(attempts__lt=MEDIA_PURGE_MAX_ATTEMPTS)
+            .order_by("id")[:batch_size]
+        )
+
+        done = []
+        failed = []
+
+        for item in queued:
+            try:
+                # 🔹 A file that is already gone counts as deleted
+                default_storage.delete(item.name)
+                done.append(item.id)
+            except Exception as e:
+                logger.warning("Could not delete media file %s: %s", item.name, e)
+                item.attempts += 1
+                item.last_error = str(e)
+                failed.append(item)
+
+        MediaDeletion.objects.filter(id__in=done).delete()
+        MediaDeletion.objects.bulk_update(failed, ["attempts", "last_error"])
+
+    return len(queued)
+
+
+def file_fields():
+    """
+    (model, field) for every file / image field in the project
+    """
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def referenced_media():
+    """
+    Every stored file name some row still points at
+    """
+    names = set()
+
+    for model, field in file_fields():
+        names.update(
+            model._default_manager
+            .exclude(**{field.attname: ""})
+            .exclude(**{f"{field.attname}__isnull": True})
+            .values_list(field.attname, flat=True)
+            .iterator(chunk_size=5000)
+        )
+
+        variants_field = variants_field_name(field.name)
+        if hasattr(model, variants_field):
+            for variants in (
+                model._default_manager
+                .exclude(**{variants_field: {}})
+                .values_list(variants_field, flat=True)
+                .iterator(chunk_size=5000)
+            ):
+                names.update(variant_names(variants))
+
+    # Queued files are already taken care of
+    names.update(MediaDeletion.objects.values_list("name", flat=True))
+
+    return names
+
+
+def orphaned_media(min_age=ORPHAN_MIN_AGE):
+    """
+    Yield (name, size) for files under GC_MEDIA_DIRS that no row
+    references
+    """
+    referenced = referenced_media()
+    cutoff = time.time() - min_age
+
+    for directory in GC_MEDIA_DIRS:
+        root = os.path.join(settings.MEDIA_ROOT, directory)
+
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+
+                if name in referenced:
+                    continue
+
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                if stat.st_mtime > cutoff:
+                    continue
+
+                yield name, stat.st_size
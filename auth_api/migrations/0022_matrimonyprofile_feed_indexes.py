@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_api', '0021_matrimonyprofile_job_type'),
+        ('backend', '0014_subscriptionplan_reveal_limit'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matrimonyprofile',
+            index=models.Index(fields=['gender', 'religion', 'caste', '-created_at', '-id'], name='mp_feed_religion_caste_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matrimonyprofile',
+            index=models.Index(fields=['gender', 'religion', '-created_at', '-id'], name='mp_feed_religion_idx'),
+        ),
+    ]
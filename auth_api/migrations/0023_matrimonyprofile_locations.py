@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_api', '0022_matrimonyprofile_feed_indexes'),
+        ('backend', '0015_location_locationalias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matrimonyprofile',
+            name='city_location',
+            field=models.ForeignKey(blank=True, limit_choices_to={'level': 'city'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='city_profiles', to='backend.location'),
+        ),
+        migrations.AddField(
+            model_name='matrimonyprofile',
+            name='country_location',
+            field=models.ForeignKey(blank=True, limit_choices_to={'level': 'country'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='country_profiles', to='backend.location'),
+        ),
+        migrations.AddField(
+            model_name='matrimonyprofile',
+            name='state_location',
+            field=models.ForeignKey(blank=True, limit_choices_to={'level': 'state'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='state_profiles', to='backend.location'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:45
+
+import django.db.models.deletion
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_entitlements(apps, schema_editor):
+    # One row per user from their latest successful payment
+    SubscriptionPayment = apps.get_model("auth_api", "SubscriptionPayment")
+    Entitlement = apps.get_model("auth_api", "Entitlement")
+
+    payments = (
+        SubscriptionPayment.objects
+        .filter(payment_status="success", paid_at__isnull=False)
+        .select_related("subscription")
+        .order_by("user_id", "-paid_at")
+    )
+
+    now = timezone.now()
+    seen = set()
+    entitlements = []
+
+    for payment in payments.iterator(chunk_size=1000):
+        if payment.user_id in seen:
+            continue
+        seen.add(payment.user_id)
+
+        expires_at = payment.expires_at or (
+            payment.paid_at + timedelta(days=payment.subscription.validity)
+        )
+        entitlements.append(Entitlement(
+            user_id=payment.user_id,
+            plan_id=payment.subscription_id,
+            payment_id=payment.id,
+            reveal_limit=payment.subscription.reveal_limit,
+            expires_at=expires_at,
+            status="active" if expires_at > now else "expired",
+        ))
+
+    Entitlement.objects.bulk_create(entitlements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_api', '0024_customuser_search_indexes'),
+        ('backend', '0015_location_locationalias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entitlement',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='entitlement', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('reveal_limit', models.PositiveIntegerField(default=0)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('expired', 'Expired')], default='active', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='auth_api.subscriptionpayment')),
+                ('plan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entitlements', to='backend.subscriptionplan')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='entitlement_status_expiry_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_entitlements, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 from backend.models import Caste, MusicGenre, MusicActivity, ReadingPreference, MovieGenre
-from backend.models import SubscriptionPlan
+from backend.models import SubscriptionPlan, Location
 import uuid
 import random
 import re
@@ -34,7 +36,35 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
     
   
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class ImageVariantsMixin:
+    """
+    Plain saves of an existing row leave the VARIANTS_FIELDS columns
+    alone. They are written by the generate_image_variants task (see
+    auth_api.images), and an instance loaded before the task finished
+    would otherwise write the stale value back. Name them in
+    update_fields to write them anyway.
+    """
+    VARIANTS_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.VARIANTS_FIELDS
+                and field.attname not in deferred
+            ]
+
+        super().save(*args, **kwargs)
+
+
+class CustomUser(ImageVariantsMixin, AbstractBaseUser, PermissionsMixin):
 
     ROLE_CHOICES = (
         ("admin", "Admin"),
@@ -70,6 +100,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         null=True,
         blank=True
     )
+    # Resized WebP copies (auth_api.images)
+    profile_image_variants = models.JSONField(default=dict, blank=True)
 
     fcm_token = models.CharField(
         max_length=255,
@@ -94,6 +126,27 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # 🔍 Profile search: icontains compiles to UPPER(col) LIKE, so
+            # the trigram indexes are on UPPER(col)
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="user_name_trgm_idx"
+            ),
+            GinIndex(
+                OpClass(Upper("email"), name="gin_trgm_ops"),
+                name="user_email_trgm_idx"
+            ),
+            GinIndex(
+                OpClass(Upper("phone_number"), name="gin_trgm_ops"),
+                name="user_phone_trgm_idx"
+            ),
+            models.Index(fields=["phone_number"], name="user_phone_idx"),
+        ]
+
+    VARIANTS_FIELDS = ("profile_image_variants",)
+
     def save(self, *args, **kwargs):
         if not self.unique_id:
             self.unique_id = self.generate_unique_id()
@@ -145,7 +198,7 @@ class PhoneOTP(models.Model):
         return timezone.now() > self.created_at + timezone.timedelta(minutes=10)
 
 
-class UserImage(models.Model):
+class UserImage(ImageVariantsMixin, models.Model):
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
@@ -155,11 +208,14 @@ class UserImage(models.Model):
     image = models.ImageField(
         upload_to="user_images/"
     )
+    image_variants = models.JSONField(default=dict, blank=True)
 
     uploaded_at = models.DateTimeField(
         auto_now_add=True
     )
 
+    VARIANTS_FIELDS = ("image_variants",)
+
     def __str__(self):
         return f"{self.user.email} - Image {self.id}"
 
@@ -309,6 +365,34 @@ class MatrimonyProfile(models.Model):
     state = models.CharField(max_length=100)
     city = models.CharField(max_length=100)
 
+    # 🔹 Canonical locations resolved from the text above (used for filtering)
+    country_location = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='country_profiles',
+        limit_choices_to={'level': 'country'}
+    )
+
+    state_location = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='state_profiles',
+        limit_choices_to={'level': 'state'}
+    )
+
+    city_location = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='city_profiles',
+        limit_choices_to={'level': 'city'}
+    )
+
     # 👪 Family
     family_status = models.CharField(max_length=20, choices=FAMILY_STATUS_CHOICES)
     family_worth = models.CharField(max_length=20, choices=FAMILY_WORTH_CHOICES)
@@ -321,6 +405,44 @@ class MatrimonyProfile(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # 🔹 Match feed: same religion and caste, newest first
+            models.Index(
+                fields=["gender", "religion", "caste", "-created_at", "-id"],
+                name="mp_feed_religion_caste_idx"
+            ),
+            # 🔹 Match feed: same religion (inter-caste), newest first
+            models.Index(
+                fields=["gender", "religion", "-created_at", "-id"],
+                name="mp_feed_religion_idx"
+            ),
+        ]
+
+    LOCATION_FIELDS = ("country", "state", "city")
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+
+        # 🔹 Re-resolve canonical locations whenever the text may have changed
+        if update_fields is None or set(update_fields) & set(self.LOCATION_FIELDS):
+            self.resolve_locations()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {
+                    f"{field}_location" for field in self.LOCATION_FIELDS
+                }
+
+        super().save(*args, **kwargs)
+
+    def resolve_locations(self):
+        from backend.locations import resolve_profile_location
+
+        (
+            self.country_location_id,
+            self.state_location_id,
+            self.city_location_id,
+        ) = resolve_profile_location(self.country, self.state, self.city)
+
     def __str__(self):
         return f"{self.user.email} Profile"
 
@@ -405,6 +527,9 @@ class SubscriptionPayment(models.Model):
 
     )
 
+    # Paid for, whether or not the subscription has run out yet
+    PAID_STATUSES = ("success", "expired")
+
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
@@ -465,3 +590,85 @@ class SubscriptionPayment(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - ₹{self.amount} - {self.payment_status}"
+
+
+class Entitlement(models.Model):
+    """
+    A user's current subscription, one row per user. Written together
+    with the successful payment and read by primary key (see
+    auth_api.entitlements) instead of scanning SubscriptionPayment.
+    """
+    STATUS_CHOICES = (
+        ("active", "Active"),
+        ("expired", "Expired"),
+    )
+
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="entitlement"
+    )
+
+    plan = models.ForeignKey(
+        SubscriptionPlan,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="entitlements"
+    )
+
+    payment = models.ForeignKey(
+        SubscriptionPayment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+
+    reveal_limit = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="active"
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # 🔹 Expiry sweep: active entitlements past expires_at
+            models.Index(
+                fields=["status", "expires_at"],
+                name="entitlement_status_expiry_idx"
+            ),
+        ]
+
+    @property
+    def is_active(self):
+        return (
+            self.status == "active" and
+            self.expires_at is not None and
+            self.expires_at > timezone.now()
+        )
+
+    def __str__(self):
+        return f"{self.user_id} - {self.status} until {self.expires_at}"
+
+
+class MediaDeletion(models.Model):
+    """
+    A stored file whose row is gone, waiting to be unlinked by
+    auth_api.tasks.purge_deleted_media (see auth_api.media)
+    """
+    name = models.CharField(max_length=255, unique=True)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
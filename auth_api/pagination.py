@@ -1,7 +1,101 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 
 
 class BlogPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 50
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a (timestamp, id) pair, newest first.
+
+    Each page seeks past the last row the client saw instead of using an
+    OFFSET, so a deep page costs the same as the first one, and `has_more`
+    comes from fetching one extra row instead of a COUNT(*).
+    """
+    page_size = 20
+    max_page_size = 50
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+
+    # (timestamp field, unique tie-breaker field)
+    keyset_fields = ("created_at", "id")
+
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(
+                self.page_size_query_param, self.page_size
+            ))
+        except (TypeError, ValueError):
+            return self.page_size
+
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        time_field, id_field = self.keyset_fields
+        payload = json.dumps([
+            getattr(obj, time_field).isoformat(),
+            getattr(obj, id_field),
+        ])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            timestamp = parse_datetime(timestamp)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return timestamp, pk
+
+    def seek_filter(self, timestamp, pk, older=True):
+        """
+        Rows strictly after (timestamp, pk) in the given direction.
+        """
+        time_field, id_field = self.keyset_fields
+        op = "lt" if older else "gt"
+
+        return (
+            Q(**{f"{time_field}__{op}": timestamp}) |
+            Q(**{time_field: timestamp, f"{id_field}__{op}": pk})
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        time_field, id_field = self.keyset_fields
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(f"-{time_field}", f"-{id_field}")
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.seek_filter(*self.decode_cursor(cursor)))
+
+        rows = list(queryset[:page_size + 1])
+
+        self.has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_more else None
+
+        return rows
+
+    def get_paginated_data(self, data):
+        return {
+            "next_cursor": self.next_cursor,
+            "has_more": self.has_more,
+            "results": data,
+        }
@@ -0,0 +1,201 @@
+"""
+Hard delete of soft-deleted accounts.
+
+hard_delete_soft_deleted_users (auth_api.tasks) hands purge_users() a
+batch of user ids at a time. Every table that references the batch is
+emptied with `user_id IN (batch)` deletes, at most PURGE_ROW_CHUNK_SIZE
+rows per statement and transaction, so no statement runs long or holds
+many row locks. The users themselves go last.
+
+Nothing is tracked besides the rows: a run that is interrupted (worker
+restart, deploy) leaves the users soft-deleted with some of their rows
+already gone, and the next run simply finishes them. A run also stops
+by itself after PURGE_TIME_BUDGET and queues the next one.
+
+Uploaded files are not touched here: deleting the user, gallery image
+and story image rows queues their files for the media purge (see
+auth_api.media).
+"""
+import logging
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from backend.models import SubAdminMenuPermission, UserReport
+from chat.events import notify_rooms_deleted
+from chat.models import ChatMessage, ChatRoom, PushNotification
+from match.models import (
+    ContactInfoView,
+    HiddenMatch,
+    MatchExclusion,
+    MatchFeed,
+    MatchFeedEntry,
+    MatchRequest,
+    Notification,
+    SuccessStory,
+    SuccessStoryImage,
+)
+from .models import (
+    CustomUser,
+    Entitlement,
+    MatrimonyProfile,
+    PersonalLifestyle,
+    PhoneOTP,
+    SubscriptionPayment,
+    UserImage,
+)
+
+logger = logging.getLogger(__name__)
+
+PURGE_USER_BATCH_SIZE = 100
+PURGE_ROW_CHUNK_SIZE = 2000
+
+PURGE_LOCK = "hard_delete_users"
+PURGE_LOCK_TIMEOUT = 10 * 60  # renewed after every batch
+
+# A run stops after this long and queues the next one to carry on
+PURGE_TIME_BUDGET = 30 * 60
+
+
+def purgeable_users(threshold):
+    """
+    Users soft deleted on or before `threshold`
+    """
+    return CustomUser.objects.filter(is_deleted=True, deleted_at__lte=threshold)
+
+
+def dependent_rows(user_ids):
+    """
+    (label, queryset) for every row that goes with the users, children
+    before parents
+    """
+    phone_numbers = (
+        CustomUser.objects
+        .filter(id__in=user_ids)
+        .exclude(phone_number__isnull=True)
+        .values("phone_number")
+    )
+
+    return [
+        ("chat_messages", ChatMessage.objects.filter(
+            Q(sender_id__in=user_ids) | Q(receiver_id__in=user_ids)
+        )),
+        ("chat_rooms", ChatRoom.objects.filter(
+            Q(user1_id__in=user_ids) | Q(user2_id__in=user_ids)
+        )),
+        ("push_notifications", PushNotification.objects.filter(recipient_id__in=user_ids)),
+        ("notifications", Notification.objects.filter(
+            Q(recipient_id__in=user_ids) |
+            Q(sender_id__in=user_ids) |
+            Q(match_request__from_user_id__in=user_ids) |
+            Q(match_request__to_user_id__in=user_ids)
+        )),
+        ("match_feed_entries", MatchFeedEntry.objects.filter(
+            Q(owner_id__in=user_ids) |
+            Q(candidate_id__in=user_ids) |
+            Q(profile__user_id__in=user_ids)
+        )),
+        ("match_feeds", MatchFeed.objects.filter(user_id__in=user_ids)),
+        ("match_exclusions", MatchExclusion.objects.filter(
+            Q(user_id__in=user_ids) | Q(excluded_user_id__in=user_ids)
+        )),
+        ("hidden_matches", HiddenMatch.objects.filter(
+            Q(user_id__in=user_ids) | Q(hidden_user_id__in=user_ids)
+        )),
+        ("match_requests", MatchRequest.objects.filter(
+            Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids)
+        )),
+        ("contact_info_views", ContactInfoView.objects.filter(
+            Q(viewer_id__in=user_ids) | Q(viewed_user_id__in=user_ids)
+        )),
+        ("success_story_images", SuccessStoryImage.objects.filter(
+            success_story__created_by_id__in=user_ids
+        )),
+        ("success_stories", SuccessStory.objects.filter(created_by_id__in=user_ids)),
+        ("user_reports", UserReport.objects.filter(
+            Q(reported_by_id__in=user_ids) | Q(reported_user_id__in=user_ids)
+        )),
+        ("menu_permissions", SubAdminMenuPermission.objects.filter(sub_admin_id__in=user_ids)),
+        ("user_images", UserImage.objects.filter(user_id__in=user_ids)),
+        ("lifestyles", PersonalLifestyle.objects.filter(profile__user_id__in=user_ids)),
+        ("profiles", MatrimonyProfile.objects.filter(user_id__in=user_ids)),
+        ("entitlements", Entitlement.objects.filter(user_id__in=user_ids)),
+        ("payments", SubscriptionPayment.objects.filter(user_id__in=user_ids)),
+        ("phone_otps", PhoneOTP.objects.filter(phone_number__in=phone_numbers)),
+    ]
+
+
+def delete_in_chunks(queryset, chunk_size=PURGE_ROW_CHUNK_SIZE, on_chunk=None):
+    """
+    Delete the rows of `queryset`, chunk_size primary keys per
+    transaction. Returns the number of rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+
+    while True:
+        pks = list(queryset.order_by().values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+
+        with transaction.atomic():
+            if on_chunk:
+                on_chunk(pks)
+            deleted += model.objects.filter(pk__in=pks).delete()[1].get(model._meta.label, 0)
+
+
+def purge_users(user_ids, threshold):
+    """
+    Hard delete one batch of soft-deleted users. Returns {label: rows
+    deleted}.
+    """
+    # Only users still due (one could have been restored since)
+    user_ids = list(
+        purgeable_users(threshold)
+        .filter(id__in=user_ids)
+        .values_list("id", flat=True)
+    )
+    counts = {}
+
+    if not user_ids:
+        return counts
+
+    for label, queryset in dependent_rows(user_ids):
+        # 🔹 Open chat sockets of deleted rooms close themselves
+        on_chunk = notify_rooms_deleted if label == "chat_rooms" else None
+
+        counts[label] = delete_in_chunks(queryset, on_chunk=on_chunk)
+
+    counts["users"] = delete_in_chunks(purgeable_users(threshold).filter(id__in=user_ids))
+
+    return counts
+
+
+def acquire_purge_lock():
+    """
+    One run at a time; a crashed run's lock times out. Returns the
+    token that owns the lock, or None if another run holds it.
+    """
+    token = uuid.uuid4().hex
+    return token if cache.add(PURGE_LOCK, token, PURGE_LOCK_TIMEOUT) else None
+
+
+def renew_purge_lock(token):
+    """
+    Extend the lock after a batch. Returns False if it expired and
+    another run took it meanwhile.
+    """
+    owner = cache.get(PURGE_LOCK)
+
+    if owner == token:
+        return cache.touch(PURGE_LOCK, PURGE_LOCK_TIMEOUT)
+    if owner is None:
+        return cache.add(PURGE_LOCK, token, PURGE_LOCK_TIMEOUT)
+    return False
+
+
+def release_purge_lock(token):
+    if cache.get(PURGE_LOCK) == token:
+        cache.delete(PURGE_LOCK)
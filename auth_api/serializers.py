@@ -5,6 +5,8 @@ from backend.models import Caste, SubscriptionPlan
 from auth_api.models import MatrimonyProfile
 from auth_api.models import CustomUser as User
 from .models import *
+from .images import image_variant
+from .uploads import inspect_image
 from django.utils import timezone
 import pytz
 from backend.models import Blog
@@ -277,11 +279,21 @@ class SubscriptionPlanSerializer(serializers.ModelSerializer):
 
 # images 
 class MultipleImageUploadSerializer(serializers.Serializer):
+    # FileField, not ImageField: no decoding in the request
     images = serializers.ListField(
-        child=serializers.ImageField(),
+        child=serializers.FileField(),
         allow_empty=False
     )
 
+    def validate_images(self, images):
+        for image in images:
+            try:
+                inspect_image(image)
+            except ValueError as e:
+                raise serializers.ValidationError(str(e))
+
+        return images
+
 
 # religion 
 class ReligionSerializer(serializers.ModelSerializer):
@@ -335,9 +347,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
 
         if obj.profile_image:
+            profile_image = image_variant(obj.profile_image, "medium")
             if request:
-                return request.build_absolute_uri(obj.profile_image.url)
-            return obj.profile_image.url
+                return request.build_absolute_uri(profile_image.url)
+            return profile_image.url
 
         return None
 
@@ -477,15 +490,23 @@ class MatrimonyProfileSerializer(serializers.ModelSerializer):
 # user multiple images
 class UserImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = UserImage
-        fields = ("id", "image")
+        fields = ("id", "image", "thumbnail")
 
     def get_image(self, obj):
+        return self.variant_url(obj, "large")
+
+    def get_thumbnail(self, obj):
+        return self.variant_url(obj, "thumb")
+
+    def variant_url(self, obj, variant):
         request = self.context.get("request")
         if obj.image:
-            return request.build_absolute_uri(obj.image.url) if request else obj.image.url
+            url = image_variant(obj.image, variant).url
+            return request.build_absolute_uri(url) if request else url
         return None
 
         
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from match.models import SuccessStoryImage
+from .images import schedule_stale_variants
+from .media import queue_media_deletion, stored_media
+from .models import CustomUser, UserImage
+from .user_cache import invalidate_cached_user
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def drop_cached_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.id)
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=UserImage)
+@receiver(post_delete, sender=SuccessStoryImage)
+def queue_deleted_media(sender, instance, **kwargs):
+    # Same transaction as the delete (see auth_api.media)
+    queue_media_deletion(stored_media(instance))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=UserImage)
+def queue_image_variants(sender, instance, update_fields=None, **kwargs):
+    # New or replaced photo → resized copies in the background
+    schedule_stale_variants(instance, update_fields)
@@ -1,119 +1,169 @@
+import logging
+import time
+
 from celery import shared_task
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 
-from .models import SubscriptionPayment, CustomUser
+from .models import SubscriptionPayment, CustomUser, Entitlement
+from .entitlements import invalidate_entitlements
+from . import images, media, purge
+
+logger = logging.getLogger(__name__)
+
+
+# Entitlements expired per transaction
+EXPIRE_SUBSCRIPTIONS_CHUNK_SIZE = 1000
 
 
 @shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 10})
 def expire_subscriptions(self):
+    """
+    Mark lapsed subscriptions expired, a chunk of users (primary key
+    range) at a time: one UPDATE each for the entitlements, the payments
+    and the users' is_subscribed flag, then one cache invalidation per
+    affected user. Safe to rerun; a retry picks up where it stopped.
+    """
     now = timezone.now()
+    expired_count = 0
+    last_id = 0
+
+    lapsed = Entitlement.objects.filter(status="active", expires_at__lt=now)
 
-    expired_payments = SubscriptionPayment.objects.filter(
-        payment_status="success",
-        expires_at__isnull=False,
-        expires_at__lt=now,
-        user__is_premium=True
-    ).select_related("user")
+    while True:
+        # 🔹 Next primary key range (entitlement_status_expiry_idx)
+        user_ids = list(
+            lapsed
+            .filter(user_id__gt=last_id)
+            .order_by("user_id")
+            .values_list("user_id", flat=True)[:EXPIRE_SUBSCRIPTIONS_CHUNK_SIZE]
+        )
+        if not user_ids:
+            break
 
-    expired_users = set()
+        first_id, last_id = last_id + 1, user_ids[-1]
 
-    for payment in expired_payments:
-        payment.payment_status = "refunded"  # or "expired" (better – see note)
-        payment.save(update_fields=["payment_status"])
+        with transaction.atomic():
+            # Conditional: a user who renewed meanwhile is left alone
+            expired_count += lapsed.filter(
+                user_id__gte=first_id,
+                user_id__lte=last_id
+            ).update(status="expired")
 
-        expired_users.add(payment.user)
+            SubscriptionPayment.objects.filter(
+                user_id__gte=first_id,
+                user_id__lte=last_id,
+                payment_status="success",
+                expires_at__lt=now
+            ).update(payment_status="expired")
 
-    # Update users in bulk
-    for user in expired_users:
-        user.is_premium = False
-        user.save(update_fields=["is_premium"])
+            CustomUser.objects.filter(
+                id__range=(first_id, last_id),
+                is_subscribed=True,
+                subscription_expires_at__lt=now
+            ).update(is_subscribed=False)
 
-    return f"Expired {len(expired_users)} subscriptions"
+            invalidate_entitlements(user_ids)
+
+    return f"Expired {expired_count} subscriptions"
 
 
 @shared_task(bind=True)
 def hard_delete_soft_deleted_users(self):
     """
-    Hard delete users who were soft deleted 30 days ago
+    Hard delete users who were soft deleted 30 days ago, in batches (see
+    auth_api.purge). Resumable: an interrupted run is finished by the
+    next one, and a run past PURGE_TIME_BUDGET queues its own successor.
     """
-    print("\n" + "🔥 " + "=" * 60)
-    print("🔥 HARD DELETE SOFT DELETED USERS TASK STARTED")
-    print("🔥 " + "=" * 60)
-    
-    now = timezone.now()
-    delete_threshold = now - timedelta(days=30)
-    
-    # Find soft deleted users older than 30 days
-    soft_deleted_users = CustomUser.objects.filter(
-        is_deleted=True,
-        deleted_at__lte=delete_threshold
-    )
-    
-    user_count = soft_deleted_users.count()
-    print(f"📊 Found {user_count} users to hard delete")
-    
-    if user_count == 0:
-        print("✅ No users to delete")
-        print("=" * 70 + "\n")
-        return "No users to delete"
-    
-    # Import match app models for cascading deletes
-    from match.models import MatchRequest, Notification, SuccessStory, ContactInfoView
-    
-    deleted_count = 0
-    error_count = 0
-    
-    for user in soft_deleted_users:
-        try:
-            print(f"\n🗑️ Processing user: {user.email}")
-            
-            # Delete notifications
-            Notification.objects.filter(recipient=user).delete()
-            Notification.objects.filter(sender=user).delete()
-            print(f"  ✓ Notifications deleted")
-            
-            # Delete match requests
-            MatchRequest.objects.filter(from_user=user).delete()
-            MatchRequest.objects.filter(to_user=user).delete()
-            print(f"  ✓ Match requests deleted")
-            
-            # Delete contact info views
-            ContactInfoView.objects.filter(viewer=user).delete()
-            ContactInfoView.objects.filter(viewed_user=user).delete()
-            print(f"  ✓ Contact info views deleted")
-            
-            # Delete success stories
-            success_stories = SuccessStory.objects.filter(created_by=user)
-            for story in success_stories:
-                story.images.all().delete()
-            success_stories.delete()
-            print(f"  ✓ Success stories deleted")
-            
-            # Delete user data
-            from auth_api.models import UserImage, PersonalLifestyle, MatrimonyProfile, SubscriptionPayment, PhoneOTP
-            
-            UserImage.objects.filter(user=user).delete()
-            PersonalLifestyle.objects.filter(profile__user=user).delete()
-            MatrimonyProfile.objects.filter(user=user).delete()
-            SubscriptionPayment.objects.filter(user=user).delete()
-            PhoneOTP.objects.filter(phone_number=user.phone_number).delete()
-            print(f"  ✓ User data deleted")
-            
-            # Hard delete user
-            user.delete()
-            print(f"  ✓ User account permanently deleted")
-            
-            deleted_count += 1
-            
-        except Exception as e:
-            error_count += 1
-            print(f"  ❌ Error deleting user: {str(e)}")
-    
-    print("\n" + "=" * 60)
-    print(f"✅ Hard delete task completed")
-    print(f"📊 Successfully deleted: {deleted_count} users")
-    print(f"⚠️  Errors: {error_count} users")
-    print("=" * 70 + "\n")
-    
-    return f"Hard deleted {deleted_count} users, {error_count} errors"
+    lock = purge.acquire_purge_lock()
+    if not lock:
+        return "Hard delete already running"
+
+    threshold = timezone.now() - timedelta(days=30)
+    totals = {}
+    batches = 0
+    last_id = 0
+    deadline = time.monotonic() + purge.PURGE_TIME_BUDGET
+    resume = False
+
+    try:
+        while True:
+            user_ids = list(
+                purge.purgeable_users(threshold)
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:purge.PURGE_USER_BATCH_SIZE]
+            )
+            if not user_ids:
+                break
+
+            last_id = user_ids[-1]
+            started = time.monotonic()
+
+            counts = purge.purge_users(user_ids, threshold)
+
+            batches += 1
+            for label, count in counts.items():
+                totals[label] = totals.get(label, 0) + count
+
+            # 🔹 Progress: worker log + task state (Flower / AsyncResult)
+            logger.info(
+                "Hard delete batch %s: %s users in %.1fs %s",
+                batches, counts.get("users", 0), time.monotonic() - started, counts
+            )
+            self.update_state(state="PROGRESS", meta={"batches": batches, "deleted": totals})
+
+            if not purge.renew_purge_lock(lock):
+                logger.warning("Hard delete lock expired and was taken by another run, stopping")
+                return f"Hard deleted {totals.get('users', 0)} users in {batches} batches, lock lost"
+
+            if time.monotonic() > deadline:
+                resume = True
+                break
+    finally:
+        purge.release_purge_lock(lock)
+
+    if resume:
+        # 🔹 Out of time: the next run picks up where this one stopped
+        logger.info("Hard delete paused after %s batches: %s", batches, totals)
+        hard_delete_soft_deleted_users.apply_async(countdown=60)
+        return f"Hard deleted {totals.get('users', 0)} users in {batches} batches, continuing"
+
+    logger.info("Hard delete finished: %s", totals)
+
+    return f"Hard deleted {totals.get('users', 0)} users in {batches} batches"
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 10})
+def purge_deleted_media(self):
+    """
+    Unlink queued media files, one batch at a time
+    """
+    # Deletions committed from here on schedule a fresh run
+    cache.delete(media.MEDIA_PURGE_LOCK)
+
+    total = 0
+
+    while True:
+        count = media.purge_batch()
+        total += count
+
+        if count < media.MEDIA_PURGE_BATCH_SIZE:
+            break
+
+    return f"Purged {total} media files"
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 10})
+def generate_image_variants(self, model_label, pks):
+    """
+    Resized WebP copies of newly uploaded photos (see auth_api.images)
+    """
+    model = apps.get_model(model_label)
+
+    updated = sum(images.generate_variants(model, pk) for pk in pks)
+
+    return f"Generated variants for {updated} of {len(pks)} {model_label} rows"
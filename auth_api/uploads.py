@@ -0,0 +1,142 @@
+"""
+Bounded photo uploads.
+
+UserMultipleImageUploadAPI parses its multipart body with
+BoundedImageUploadParser. Every file is spooled to a temporary file as
+it streams in (never held in memory), and parsing stops as soon as the
+request is too large, carries too many files or one file grows past
+USER_IMAGE_MAX_SIZE.
+
+The spooled files are checked from their headers only (format and
+dimensions, no decoding) and moved into storage. Decoding and resizing
+happen in the generate_image_variants task (auth_api.images), so the
+request returns as soon as the bytes are stored.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.http import QueryDict
+from django.http.multipartparser import MultiPartParser as DjangoMultiPartParser
+from django.http.multipartparser import MultiPartParserError
+from django.utils.datastructures import MultiValueDict
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+ALLOWED_IMAGE_FORMATS = ("JPEG", "PNG", "WEBP")
+
+# Multipart boundaries and form fields on top of the files
+UPLOAD_OVERHEAD = 64 * 1024
+
+
+def max_files():
+    return getattr(settings, "USER_IMAGE_UPLOAD_MAX_FILES", 10)
+
+
+def max_file_size():
+    return getattr(settings, "USER_IMAGE_MAX_SIZE", 10 * 1024 * 1024)
+
+
+def max_dimension():
+    return getattr(settings, "USER_IMAGE_MAX_DIMENSION", 8000)
+
+
+def user_image_quota():
+    return getattr(settings, "USER_IMAGE_QUOTA", 20)
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spools every file to disk and stops the upload at the first limit
+    crossed; the reason is left in `error`
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.file_count = 0
+        self.file_size = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # 🔹 Refuse an oversized body before reading any of it
+        if content_length > max_files() * max_file_size() + UPLOAD_OVERHEAD:
+            self.error = "Upload is too large"
+            return QueryDict(encoding=encoding), MultiValueDict()
+
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        self.file_count += 1
+        self.file_size = 0
+
+        if self.file_count > max_files():
+            self.stop(f"You can upload at most {max_files()} images at a time")
+
+        super().new_file(field_name, file_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file_size += len(raw_data)
+
+        if self.file_size > max_file_size():
+            self.stop(
+                f"{self.file_name} is larger than {max_file_size() // (1024 * 1024)} MB"
+            )
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def stop(self, error):
+        self.error = error
+        # The rest of the body is read and discarded, so the response still gets through
+        raise StopUpload(connection_reset=False)
+
+
+class BoundedImageUploadParser(MultiPartParser):
+    """
+    MultiPartParser that only uses BoundedImageUploadHandler
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context["request"]
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta["CONTENT_TYPE"] = media_type
+
+        handler = BoundedImageUploadHandler(request)
+
+        try:
+            parser = DjangoMultiPartParser(meta, stream, [handler], encoding)
+            data, files = parser.parse()
+        except MultiPartParserError as exc:
+            raise ParseError(f"Multipart form parse error - {exc}")
+
+        if handler.error:
+            raise ParseError(handler.error)
+
+        return DataAndFiles(data, files)
+
+
+def inspect_image(file):
+    """
+    (format, width, height) of an uploaded image, read from its header.
+    Raises ValueError if it isn't an acceptable photo.
+    """
+    try:
+        # Image.open() parses the header only; pixels are never decoded
+        with Image.open(file) as image:
+            image_format = image.format
+            width, height = image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise ValueError(f"{file.name} is not a valid image")
+    finally:
+        file.seek(0)
+
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise ValueError(f"{file.name}: only JPEG, PNG and WebP images are allowed")
+
+    if max(width, height) > max_dimension():
+        raise ValueError(
+            f"{file.name} is {width}x{height}; images can be at most "
+            f"{max_dimension()} pixels on a side"
+        )
+
+    return image_format, width, height
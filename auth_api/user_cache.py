@@ -0,0 +1,111 @@
+"""
+Cached request user.
+
+Every authenticated request and websocket connect needs the user's
+identity columns, not the whole CustomUser row. Those columns are cached
+per user (AUTH_USER_CACHE_TTL) next to a version token:
+
+- auth_user_<id>          {"version": ..., "values": [...]}
+- auth_user_version_<id>  bumped after every save / delete of the user
+
+Both keys are read with one get_many(). An entry only counts if it was
+written under the current version, so a save (deactivation, soft
+delete, profile edit) takes effect on the very next request, even if a
+concurrent request re-cached the old row.
+
+get_cached_user() returns a CustomUser built from the cached columns;
+any other field is deferred and loaded on first access, like .only().
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CustomUser
+
+CACHED_USER_FIELDS = (
+    "id",
+    "email",
+    "phone_number",
+    "role",
+    "name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "is_email_verified",
+    "unique_id",
+    "is_verified",
+    "is_deleted",
+    "profile_image",
+    "fcm_token",
+)
+
+
+def user_cache_key(user_id):
+    return f"auth_user_{user_id}"
+
+
+def user_version_key(user_id):
+    return f"auth_user_version_{user_id}"
+
+
+def build_user(field_names, values):
+    """
+    CustomUser with only `field_names` loaded; the rest stay deferred
+    """
+    by_name = dict(zip(field_names, values))
+
+    # from_db() expects the loaded fields in model field order
+    names = [
+        field.attname
+        for field in CustomUser._meta.concrete_fields
+        if field.attname in by_name
+    ]
+    return CustomUser.from_db("default", names, [by_name[name] for name in names])
+
+
+def get_cached_user(user_id):
+    """
+    The user with CACHED_USER_FIELDS loaded, or None if there is no such
+    user. Reads the database only on a cache miss.
+    """
+    entry_key = user_cache_key(user_id)
+    version_key = user_version_key(user_id)
+
+    cached = cache.get_many([entry_key, version_key])
+    version = cached.get(version_key)
+    entry = cached.get(entry_key)
+
+    if entry and entry["version"] == version:
+        return build_user(CACHED_USER_FIELDS, entry["values"])
+
+    values = (
+        CustomUser.objects
+        .filter(id=user_id)
+        .values_list(*CACHED_USER_FIELDS)
+        .first()
+    )
+    if values is None:
+        return None
+
+    values = list(values)
+    cache.set(
+        entry_key,
+        {"version": version, "values": values},
+        getattr(settings, "AUTH_USER_CACHE_TTL", 300)
+    )
+
+    return build_user(CACHED_USER_FIELDS, values)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Retire the cached entry. Runs after commit, so the next read sees the
+    new row.
+    """
+    def bump():
+        # A fresh token (never reused) rather than a counter
+        cache.set(user_version_key(user_id), time.time_ns(), None)
+
+    transaction.on_commit(bump)
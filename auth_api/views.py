@@ -24,6 +24,17 @@ from django.db.models import Q
 from django.db import models
 from .pagination import BlogPagination
 from .utils import send_sms_otp,send_registration_sms
+from .images import schedule_variants
+from .uploads import BoundedImageUploadParser, user_image_quota
+from rest_framework.exceptions import ParseError
+from match.feed import feed_criteria, schedule_profile_sync
+from .entitlements import (
+    get_entitlement,
+    get_subscription_expiry,
+    grant_entitlement,
+    is_subscription_active,
+)
+from chat.events import notify_user_changed
 import random
 # register API View
 class RegisterAPIView(APIResponseMixin, APIView):
@@ -41,6 +52,9 @@ class RegisterAPIView(APIResponseMixin, APIView):
 
         user, profile = serializer.save()
 
+        # 🔹 Add the new profile to existing match feeds (Celery)
+        schedule_profile_sync(profile.id)
+
         # 🔐 Generate JWT Tokens
         refresh = RefreshToken.for_user(user)
 
@@ -168,9 +182,17 @@ class SubscriptionPlanListAPI(APIView, APIResponseMixin):
 class UserMultipleImageUploadAPI(APIResponseMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    # 🔹 Streams files to disk, stops at the size / count limits
+    parser_classes = [BoundedImageUploadParser]
+
     def post(self, request):
+        try:
+            data = request.data
+        except ParseError as e:
+            return self.error_response(str(e.detail))
+
         serializer = MultipleImageUploadSerializer(
-            data=request.data
+            data=data
         )
 
         if not serializer.is_valid():
@@ -180,12 +202,27 @@ class UserMultipleImageUploadAPI(APIResponseMixin, APIView):
 
         try:
             with transaction.atomic():
+                # 🔒 Serialize uploads of the same user for the quota check
+                CustomUser.objects.select_for_update().filter(id=request.user.id).exists()
+
+                quota = user_image_quota()
+                existing = UserImage.objects.filter(user=request.user).count()
+
+                if existing + len(images) > quota:
+                    return self.error_response(
+                        f"You can have at most {quota} images "
+                        f"({max(0, quota - existing)} more allowed)"
+                    )
+
                 image_objs = [
                     UserImage(user=request.user, image=image)
                     for image in images
                 ]
                 UserImage.objects.bulk_create(image_objs)
 
+                # 🔹 bulk_create skips post_save: schedule the resized copies
+                schedule_variants(UserImage, [image.pk for image in image_objs])
+
             return self.success_response(
                 message="Images uploaded successfully",
                 data={
@@ -323,12 +360,11 @@ class CreateSubscriptionOrderAPIView(APIView, APIResponseMixin):
             return self.error_response("Invalid subscription plan")
 
         # ✅ Check if user already has an active subscription
-        if request.user.is_subscribed and request.user.subscription_expires_at:
-            if request.user.subscription_expires_at > timezone.now():
-                return self.error_response(
-                    errors="You already have an active subscription plan. Please wait for it to expire or contact support.",
-                    status_code=status.HTTP_400_BAD_REQUEST
-                )
+        if is_subscription_active(get_subscription_expiry(request.user.id)):
+            return self.error_response(
+                errors="You already have an active subscription plan. Please wait for it to expire or contact support.",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
 
         amount_paise = int(float(plan.price) * 100)
         if amount_paise <= 0:
@@ -424,6 +460,10 @@ class VerifySubscriptionPaymentAPIView(APIView, APIResponseMixin):
             "profile_reveal_count"
         ])
 
+        # 🔹 Current entitlement, same transaction as the payment (also
+        # refreshes cached entitlements; chat sockets pick it up live)
+        grant_entitlement(payment)
+
         return self.success_response(
             message="Payment verified and subscription activated successfully",
             data={
@@ -461,21 +501,16 @@ class MatrimonyProfileAPIView(APIView, APIResponseMixin):
         reveal_remaining = 0
         expiry_date = None
 
-        # Get latest successful payment
-        latest_payment = SubscriptionPayment.objects.filter(
-            user=request.user,
-            payment_status='success'
-        ).order_by('-paid_at').first()
+        # Current entitlement (one primary key lookup)
+        entitlement = get_entitlement(request.user.id)
 
-        if latest_payment and latest_payment.paid_at:
-            expiry_date = latest_payment.paid_at + timedelta(
-                days=latest_payment.subscription.validity
-            )
+        if entitlement:
+            expiry_date = entitlement.expires_at
 
             # Check if subscription is active
-            if expiry_date >= timezone.now():
-                subscription_plan = latest_payment.subscription.plan_name
-                reveal_limit = latest_payment.subscription.reveal_limit
+            if entitlement.is_active:
+                subscription_plan = entitlement.plan.plan_name if entitlement.plan else None
+                reveal_limit = entitlement.reveal_limit
                 reveal_contact_count = request.user.profile_reveal_count
                 reveal_remaining = max(
                     0,
@@ -504,6 +539,8 @@ class MatrimonyProfileAPIView(APIView, APIResponseMixin):
                 status.HTTP_404_NOT_FOUND
             )
 
+        criteria = feed_criteria(profile)
+
         serializer = MatrimonyProfileSerializer(
             instance=profile,
             data=request.data,
@@ -513,6 +550,12 @@ class MatrimonyProfileAPIView(APIView, APIResponseMixin):
 
         if serializer.is_valid():
             serializer.save()
+            notify_user_changed(request.user.id)
+
+            # 🔹 Gender / religion / caste changed → re-place in match feeds
+            if feed_criteria(profile) != criteria:
+                schedule_profile_sync(profile.id, rebuild_own_feed=True)
+
             return self.success_response(
                 message="Profile updated successfully",
                 data=serializer.data
@@ -659,6 +702,7 @@ class UpdateFCMTokenAPIView(APIView, APIResponseMixin):
             return self.error_response(serializer.errors)
 
         serializer.save()
+        notify_user_changed(request.user.id)
 
         return self.success_response(
             message="FCM token updated successfully",
@@ -1114,6 +1158,9 @@ class DeleteAccountAPIView(APIView, APIResponseMixin):
                 user.deleted_at = timezone.now()
                 user.is_active = False  # Deactivate account immediately
                 user.save()
+
+                # 🔹 Open chat sockets drop / stop accepting messages
+                notify_user_changed(user.id)
                 
                 print(f"🗑️ Soft deleted user account: {user.email}")
                 print(f"⏰ Scheduled for hard deletion on: {user.deleted_at + timezone.timedelta(days=30)}")
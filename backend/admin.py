@@ -1,6 +1,19 @@
 from django.contrib import admin
-from .models import SidebarMenu
+from .models import SidebarMenu, Location, LocationAlias
 # Register your models here.
 
 
 admin.site.register(SidebarMenu)
+
+
+class LocationAliasInline(admin.TabularInline):
+    model = LocationAlias
+    extra = 1
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ("name", "level", "parent", "is_active")
+    list_filter = ("level", "is_active")
+    search_fields = ("name", "aliases__name")
+    inlines = [LocationAliasInline]
@@ -0,0 +1,99 @@
+"""
+Location lookup helpers.
+
+Profiles keep the free-text country / state / city the user typed, plus
+foreign keys to the canonical Location rows resolved from that text.
+Filters use the foreign keys (indexed equality) and fall back to a
+case-insensitive substring match on the text for rows that resolved to
+no Location, and for search text that maps to no Location.
+"""
+import re
+
+from django.db.models import Q
+
+from .models import Location, LocationAlias
+
+LOCATION_LEVELS = ("country", "state", "city")
+
+
+def normalize_location_name(name):
+    """
+    " new   Delhi. " -> "new delhi"
+    """
+    name = re.sub(r"[.,]", " ", name or "")
+    return " ".join(name.split()).casefold()
+
+
+def matching_location_ids(level, name, parent_id=None):
+    """
+    Ids of active Locations at `level` whose name or alias matches `name`
+    """
+    normalized = normalize_location_name(name)
+    if not normalized:
+        return []
+
+    locations = Location.objects.filter(level=level, is_active=True)
+    if parent_id:
+        locations = locations.filter(parent_id=parent_id)
+
+    alias_of = LocationAlias.objects.filter(
+        normalized_name=normalized
+    ).values("location_id")
+
+    return list(
+        locations
+        .filter(Q(normalized_name=normalized) | Q(id__in=alias_of))
+        .values_list("id", flat=True)
+    )
+
+
+def resolve_location(level, name, parent_id=None):
+    """
+    The single Location id for `name`, or None when it is unknown or
+    ambiguous (e.g. a city name that exists in two states).
+    """
+    ids = []
+    if parent_id:
+        ids = matching_location_ids(level, name, parent_id)
+    if not ids:
+        ids = matching_location_ids(level, name)
+
+    return ids[0] if len(ids) == 1 else None
+
+
+def resolve_profile_location(country, state, city):
+    """
+    (country_id, state_id, city_id) for a profile's free-text location
+    """
+    country_id = resolve_location("country", country)
+    state_id = resolve_location("state", state, country_id)
+    city_id = resolve_location("city", city, state_id)
+
+    return country_id, state_id, city_id
+
+
+def location_filter(level, value, prefix=""):
+    """
+    Q for a country / state / city query param.
+
+    `value` is either a Location id or free text. Text that matches a
+    Location becomes an indexed lookup on the `<level>_location` key,
+    plus icontains on the raw text column for rows whose text never
+    resolved (ambiguous or unaliased names, rows not yet backfilled);
+    anything else only uses the icontains match.
+    """
+    value = str(value).strip()
+
+    if value.isdigit():
+        return Q(**{f"{prefix}{level}_location_id": int(value)})
+
+    text_match = Q(**{f"{prefix}{level}__icontains": value})
+
+    ids = matching_location_ids(level, value)
+    if ids:
+        return (
+            Q(**{f"{prefix}{level}_location_id__in": ids}) |
+            (Q(**{f"{prefix}{level}_location__isnull": True}) & text_match)
+        )
+
+    return text_match
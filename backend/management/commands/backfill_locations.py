@@ -0,0 +1,124 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auth_api.models import MatrimonyProfile
+from backend.locations import normalize_location_name, resolve_profile_location
+from backend.models import Location
+
+
+class Command(BaseCommand):
+    help = "Map free-text profile country / state / city to Location rows"
+
+    BATCH_SIZE = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--create-missing",
+            action="store_true",
+            help="Create Location rows for text that matches nothing (review / merge them in admin afterwards)"
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-resolve every profile, not only those without a city location"
+        )
+
+    def handle(self, *args, **options):
+        profiles = MatrimonyProfile.objects.only(
+            "id", "country", "state", "city",
+            "country_location", "state_location", "city_location",
+        ).order_by("id")
+
+        if not options["all"]:
+            profiles = profiles.filter(city_location__isnull=True)
+
+        updated = 0
+        unmatched = Counter()
+        batch = []
+
+        for profile in profiles.iterator(chunk_size=self.BATCH_SIZE):
+            if options["create_missing"]:
+                self.create_missing(profile)
+
+            ids = resolve_profile_location(profile.country, profile.state, profile.city)
+            current = (
+                profile.country_location_id,
+                profile.state_location_id,
+                profile.city_location_id,
+            )
+
+            for level, text, location_id in zip(
+                ("country", "state", "city"),
+                (profile.country, profile.state, profile.city),
+                ids
+            ):
+                if location_id is None and text:
+                    unmatched[(level, normalize_location_name(text))] += 1
+
+            if ids == current:
+                continue
+
+            (
+                profile.country_location_id,
+                profile.state_location_id,
+                profile.city_location_id,
+            ) = ids
+            batch.append(profile)
+
+            if len(batch) >= self.BATCH_SIZE:
+                updated += self.flush(batch)
+                batch = []
+
+        if batch:
+            updated += self.flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Profiles updated: {updated}"))
+
+        if unmatched:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Unmatched values ({len(unmatched)}), add them as locations or aliases:"
+            ))
+            for (level, text), count in unmatched.most_common(50):
+                self.stdout.write(f"  {level:<8} {text!r}: {count}")
+
+    def flush(self, batch):
+        MatrimonyProfile.objects.bulk_update(
+            batch,
+            ["country_location", "state_location", "city_location"]
+        )
+        return len(batch)
+
+    @transaction.atomic
+    def create_missing(self, profile):
+        parent = None
+
+        for level, text in (
+            ("country", profile.country),
+            ("state", profile.state),
+            ("city", profile.city),
+        ):
+            name = " ".join((text or "").split())
+            if not name:
+                break
+
+            location = (
+                Location.objects
+                .filter(
+                    level=level,
+                    parent=parent,
+                    normalized_name=normalize_location_name(name)
+                )
+                .first()
+            )
+
+            if not location:
+                location = Location.objects.create(
+                    name=name.title(),
+                    level=level,
+                    parent=parent
+                )
+                self.stdout.write(f"Created {level}: {location}")
+
+            parent = location
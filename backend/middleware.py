@@ -11,11 +11,9 @@ class ActiveUserMiddleware:
         if request.user.is_authenticated and not request.user.is_active:
             # Allow admin login/logout and admin pages
             try:
-                resolver_match = resolve(request.path)
-                if not (resolver_match.url_name in ['admin_login', 'logout'] or 
-                        request.path.startswith('/admin/') or
-                        request.path.startswith('/static/') or
-                        request.path.startswith('/media/')):
+                # Cheap prefix checks first; resolve() only when they miss
+                if not (request.path.startswith(('/admin/', '/static/', '/media/')) or
+                        resolve(request.path).url_name in ['admin_login', 'logout']):
                     # For API requests, return JSON error
                     if request.path.startswith('/api/') or request.META.get('HTTP_ACCEPT', '').startswith('application/json'):
                         return JsonResponse({
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_subscriptionplan_reveal_limit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(editable=False, max_length=100)),
+                ('level', models.CharField(choices=[('country', 'Country'), ('state', 'State'), ('city', 'City')], max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='backend.location')),
+            ],
+            options={
+                'verbose_name': 'Country / State / City',
+                'verbose_name_plural': 'Countries, States & Cities',
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(db_index=True, editable=False, max_length=100)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='backend.location')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['level', 'normalized_name'], name='location_level_name_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='location',
+            unique_together={('name', 'parent', 'level')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='locationalias',
+            unique_together={('location', 'name')},
+        ),
+    ]
@@ -36,6 +36,79 @@ class Caste(models.Model):
         return self.name
 
 
+class Location(models.Model):
+    LEVEL_CHOICES = (
+        ('country', 'Country'),
+        ('state', 'State'),
+        ('city', 'City'),
+    )
+
+    name = models.CharField(max_length=100)
+
+    # 🔹 Lower-cased, whitespace-collapsed name used for lookups
+    normalized_name = models.CharField(max_length=100, editable=False)
+
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='children'
+    )
+
+    level = models.CharField(
+        max_length=20,
+        choices=LEVEL_CHOICES
+    )
+
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "Country / State / City"
+        verbose_name_plural = "Countries, States & Cities"
+        unique_together = ('name', 'parent', 'level')
+        indexes = [
+            models.Index(fields=["level", "normalized_name"], name="location_level_name_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        from .locations import normalize_location_name
+
+        self.normalized_name = normalize_location_name(self.name)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        if self.parent:
+            return f"{self.parent} → {self.name}"
+        return self.name
+
+
+class LocationAlias(models.Model):
+    """
+    Alternate spelling of a Location ("Bengaluru" / "Bangalore", "TN")
+    """
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='aliases'
+    )
+
+    name = models.CharField(max_length=100)
+    normalized_name = models.CharField(max_length=100, editable=False, db_index=True)
+
+    class Meta:
+        unique_together = ('location', 'name')
+
+    def save(self, *args, **kwargs):
+        from .locations import normalize_location_name
+
+        self.normalized_name = normalize_location_name(self.name)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} → {self.location.name}"
+
+
 class MusicGenre(models.Model):
     name = models.CharField(max_length=50)
 
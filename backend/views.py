@@ -2,9 +2,11 @@ from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login,logout
 from django.contrib import messages
-from auth_api.models import CustomUser as User, SubscriptionPayment
+from auth_api.models import CustomUser as User, Entitlement, SubscriptionPayment
 from match.models import StoryBanner, MatchRequest, SuccessStory
 from .models import *
+from .locations import location_filter
+from chat.events import notify_user_changed, notify_user_rooms_deleted
 from django.shortcuts import get_object_or_404
 from auth_api.models import CustomUser
 from django.contrib.auth.hashers import make_password
@@ -92,12 +94,12 @@ def admin_dashboard(request):
     success_stories = SuccessStory.objects.count()
     blogs = Blog.objects.count()
     events = Event.objects.count()
-    total_revenue = SubscriptionPayment.objects.filter(payment_status='success').aggregate(total=Sum('amount'))['total'] or 0
+    total_revenue = SubscriptionPayment.objects.filter(payment_status__in=SubscriptionPayment.PAID_STATUSES).aggregate(total=Sum('amount'))['total'] or 0
 
     # Recent activities (last 10)
     recent_users = CustomUser.objects.filter(is_staff=False).order_by('-date_joined')[:5]
     recent_matches = MatchRequest.objects.select_related('from_user', 'to_user').order_by('-created_at')[:5]
-    recent_payments = SubscriptionPayment.objects.select_related('user').filter(payment_status='success').order_by('-paid_at')[:5]
+    recent_payments = SubscriptionPayment.objects.select_related('user').filter(payment_status__in=SubscriptionPayment.PAID_STATUSES).order_by('-paid_at')[:5]
 
     context = {
         'total_users': total_users,
@@ -332,9 +334,9 @@ def user_list(request):
     if gender:
         users = users.filter(profile__gender=gender)
     if city:
-        users = users.filter(profile__city__icontains=city)
+        users = users.filter(location_filter("city", city, "profile__"))
     if state:
-        users = users.filter(profile__state__icontains=state)
+        users = users.filter(location_filter("state", state, "profile__"))
     if is_premium:
         users = users.filter(is_premium=bool(int(is_premium)))
     
@@ -360,13 +362,14 @@ def user_details(request, user_id):
         .get(id=user_id)
     )
 
-    subscription = (
-        SubscriptionPayment.objects
-        .filter(user=user, payment_status='success')
-        .select_related('subscription')
-        .order_by('-paid_at')
+    # Payment behind the current entitlement (primary key lookup)
+    entitlement = (
+        Entitlement.objects
+        .select_related('payment__subscription')
+        .filter(user=user)
         .first()
     )
+    subscription = entitlement.payment if entitlement else None
 
     return render(request, "user_details.html", {
         "user": user,
@@ -436,6 +439,7 @@ def toggle_user_active(request, user_id):
 
         user.is_active = bool(is_active)
         user.save()
+        notify_user_changed(user.id)
 
         return JsonResponse({
             "status": True,
@@ -453,6 +457,7 @@ def toggle_user_active(request, user_id):
 
 def delete_user(request, user_id):
     user = get_object_or_404(CustomUser, id=user_id)
+    notify_user_rooms_deleted(user.id)
     user.delete()
     messages.success(request, "User deleted successfully.")
     return redirect("user_list")
@@ -759,10 +764,10 @@ def revenue(request):
 
     # Statistics
     total_revenue = payments.filter(
-        payment_status="success"
+        payment_status__in=SubscriptionPayment.PAID_STATUSES
     ).aggregate(total=Sum("amount"))["total"] or 0
 
-    success_count = payments.filter(payment_status="success").count()
+    success_count = payments.filter(payment_status__in=SubscriptionPayment.PAID_STATUSES).count()
     failed_count = payments.filter(payment_status="failed").count()
 
     context = {
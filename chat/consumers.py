@@ -1,75 +1,172 @@
+import asyncio
 import json
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import sync_to_async
-from .models import ChatRoom, ChatMessage
-from .services import can_send_message
+from django.conf import settings
+from django.db import transaction
+from .models import ChatMessage
+from auth_api.entitlements import forget_local_entitlement
+from auth_api.models import CustomUser
+from .context import ChatRoomContext, user_room_partners
+from .events import presence_group_name, room_group_name, user_group_name
+from .presence import connection_closed, connection_opened, connection_renewed, presence_event
+from .services import (
+    check_chat_permission,
+    forget_last_message,
+    forget_unread,
+    mark_room_read,
+    record_last_message,
+    record_unread,
+)
 from .constants import PREDEFINED_CHAT
-from .firebase import send_push_notification
+from .push import queue_chat_message_push
+from .message_buffer import buffering_enabled, get_message_buffer
+
+
+class ChatRoomActionsMixin:
+    """
+    Frame handling shared by ChatConsumer (one socket per room) and
+    UserChatConsumer (one socket for all of a user's rooms).
+
+    Every action runs against a ChatRoomContext, and every room event sent
+    back to the client carries its room_id. Consumers keep the contexts
+    they have loaded in `self.contexts` ({room_id: ChatRoomContext}).
+    """
+
+    def open_contexts(self):
+        return list(self.contexts.values())
+
+    async def send_error(self, message, room_id=None):
+        payload = {"type": "error", "message": message}
+        if room_id is not None:
+            payload["room_id"] = room_id
+
+        await self.send(json.dumps(payload))
+
+    async def after_buffered_writes(self, attempt):
+        """
+        Run `attempt` (an async lookup or delete that is falsy while the
+        message isn't stored) and, with buffered writes, try again once
+        the message could have been flushed: right after flushing this
+        process's buffer, then once more after a flush interval for a
+        message still buffered in another worker.
+        """
+        result = await attempt()
+        if result or not buffering_enabled():
+            return result
+
+        buffer = get_message_buffer()
+
+        await buffer.flush()
+        result = await attempt()
+        if result:
+            return result
+
+        await asyncio.sleep(buffer.flush_interval)
+        return await attempt()
+
+    async def handle_heartbeat(self):
+        # 🟢 Keeps the presence lease alive
+        if await connection_renewed(self.user.id, self.channel_name):
+            await self.broadcast_presence(True)
+
+    async def handle_room_action(self, context, data):
+        action = data.get("action")
+        room_id = context.room.id
+        group = room_group_name(room_id)
 
-class ChatConsumer(AsyncWebsocketConsumer):
+        # =====================================================
+        # ✍️ TYPING INDICATOR
+        # =====================================================
+        if action == "typing":
+            is_typing = bool(data.get("is_typing", True))
+            now = time.monotonic()
 
-    async def connect(self):
-        self.user = self.scope["user"]
-        self.room_id = self.scope["url_route"]["kwargs"]["room_id"]
+            # 🔹 "Still typing" at most once per throttle window
+            throttle = getattr(settings, "CHAT_TYPING_THROTTLE", 3)
+            if is_typing and now - self.last_typing_at.get(room_id, 0) < throttle:
+                return
 
-        if not self.user.is_authenticated:
-            await self.close(code=4001)
-            return
+            self.last_typing_at[room_id] = now if is_typing else 0
 
-        self.chat_room = await self.get_chat_room()
-        if not self.chat_room:
-            await self.close(code=4004)
+            await self.channel_layer.group_send(
+                group,
+                {
+                    "type": "typing",
+                    "room_id": room_id,
+                    "user_id": self.user.id,
+                    "is_typing": is_typing
+                }
+            )
             return
 
-        self.room_group_name = f"chat_{self.room_id}"
-
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        # =====================================================
+        # 👀 MARK READ (watermark up to message_id)
+        # =====================================================
+        if action == "mark_read":
+            message_id = data.get("message_id")
 
-        await self.accept()
+            # The message may still be in a write buffer
+            message = await self.after_buffered_writes(
+                lambda: self.get_room_message(context.room, message_id)
+            )
+            if not message:
+                await self.send_error("Invalid message_id", room_id)
+                return
 
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+            updated = await sync_to_async(mark_room_read)(
+                context.room, self.user.id, message
+            )
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
+            if updated:
+                # 🔹 Read receipt for the other participant
+                await self.channel_layer.group_send(
+                    group,
+                    {
+                        "type": "messages_read",
+                        "room_id": room_id,
+                        "user_id": self.user.id,
+                        "message_id": message.id,
+                        "read_at": message.created_at.isoformat()
+                    }
+                )
+            return
 
         # =====================================================
         # 🔥 DELETE MESSAGE (FOR EVERYONE – HARD DELETE)
         # =====================================================
-        action = data.get("action")
         if action == "delete_message":
             message_id = data.get("message_id")
 
             if not message_id:
-                await self.send(json.dumps({
-                    "type": "error",
-                    "message": "message_id is required"
-                }))
+                await self.send_error("message_id is required", room_id)
                 return
 
-            deleted = await self.delete_message(
-                message_id=message_id,
-                user=self.user
-            )
+            deleted = False
+            if buffering_enabled():
+                deleted = await get_message_buffer().discard(message_id, room_id, self.user.id)
 
             if not deleted:
-                await self.send(json.dumps({
-                    "type": "error",
-                    "message": "You are not allowed to delete this message"
-                }))
+                # Buffered here or in another worker: wait until the row exists
+                deleted = await self.after_buffered_writes(
+                    lambda: self.delete_message(
+                        context.room,
+                        message_id=message_id,
+                        user=self.user
+                    )
+                )
+
+            if not deleted:
+                await self.send_error("You are not allowed to delete this message", room_id)
                 return
 
             # 🔥 Notify both users
             await self.channel_layer.group_send(
-                self.room_group_name,
+                group,
                 {
                     "type": "message_deleted",
+                    "room_id": room_id,
                     "message_id": message_id
                 }
             )
@@ -84,17 +181,20 @@ class ChatConsumer(AsyncWebsocketConsumer):
         answer_index = data.get("answer_index")
 
         sender = self.user
-        receiver = await self.get_receiver(sender)
+        receiver = context.other(sender.id)
+
+        if not context.is_available(receiver.id):
+            await self.send_error("This user is no longer available", room_id)
+            return
 
-        allowed, error_message = await sync_to_async(can_send_message)(
-            sender, receiver, message_type
+        allowed, error_message = check_chat_permission(
+            context.is_subscribed(sender.id),
+            context.is_subscribed(receiver.id),
+            message_type
         )
 
         if not allowed:
-            await self.send(json.dumps({
-                "type": "error",
-                "message": error_message
-            }))
+            await self.send_error(error_message, room_id)
             return
 
         suggested_answers = None
@@ -103,10 +203,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if message_type == "predefined":
 
             if question_id not in PREDEFINED_CHAT:
-                await self.send(json.dumps({
-                    "type": "error",
-                    "message": "Invalid predefined question"
-                }))
+                await self.send_error("Invalid predefined question", room_id)
                 return
 
             if answer_index is None:
@@ -120,50 +217,50 @@ class ChatConsumer(AsyncWebsocketConsumer):
             else:
                 answers = PREDEFINED_CHAT[question_id]["answers"]
                 if answer_index < 0 or answer_index >= len(answers):
-                    await self.send(json.dumps({
-                        "type": "error",
-                        "message": "Invalid answer index"
-                    }))
+                    await self.send_error("Invalid answer index", room_id)
                     return
                 message_text = answers[answer_index]
 
         # ---------- CUSTOM ----------
         elif message_type == "custom":
             if not message_text or not message_text.strip():
-                await self.send(json.dumps({
-                    "type": "error",
-                    "message": "Message text cannot be empty"
-                }))
+                await self.send_error("Message text cannot be empty", room_id)
                 return
             message_text = message_text.strip()
 
         else:
-            await self.send(json.dumps({
-                "type": "error",
-                "message": "Invalid message type"
-            }))
+            await self.send_error("Invalid message type", room_id)
             return
 
-        message = await self.create_message(
-            sender,
-            receiver,
-            message_type,
-            message_text,
-            question_id,
-            answer_index
-        )
+        if buffering_enabled():
+            # 🔹 Id assigned now, row written by the next buffer flush (pushes too)
+            message = await get_message_buffer().add(
+                chat_room=context.room,
+                sender=sender,
+                receiver=receiver,
+                message_type=message_type,
+                message_text=message_text,
+                predefined_question_id=question_id,
+                predefined_answer_index=answer_index
+            )
+        else:
+            message = await self.create_message(
+                context.room,
+                sender,
+                receiver,
+                message_type,
+                message_text,
+                question_id,
+                answer_index
+            )
 
-        await self.send_firebase_notification(
-            sender=sender,
-            receiver=receiver,
-            message_text=message.message_text,
-            room_id=self.room_id
-        )
+            await self.send_firebase_notification(message)
 
         await self.channel_layer.group_send(
-            self.room_group_name,
+            group,
             {
                 "type": "chat_message",
+                "room_id": room_id,
                 "message": {
                     "id": message.id,
                     "sender": sender.id,
@@ -178,6 +275,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if suggested_answers:
             await self.send(json.dumps({
                 "type": "suggested_answers",
+                "room_id": room_id,
                 "question_id": question_id,
                 "answers": suggested_answers
             }))
@@ -188,36 +286,94 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def chat_message(self, event):
         await self.send(json.dumps({
             "type": "message",
+            "room_id": event["room_id"],
             **event["message"]
         }))
 
     async def message_deleted(self, event):
         await self.send(json.dumps({
             "type": "message_deleted",
+            "room_id": event["room_id"],
             "message_id": event["message_id"]
         }))
 
+    async def messages_read(self, event):
+        await self.send(json.dumps({
+            "type": "messages_read",
+            "room_id": event["room_id"],
+            "user_id": event["user_id"],
+            "message_id": event["message_id"],
+            "read_at": event["read_at"]
+        }))
+
+    async def typing(self, event):
+        if event["user_id"] == self.user.id:
+            return
+
+        await self.send(json.dumps({
+            "type": "typing",
+            "room_id": event["room_id"],
+            "user_id": event["user_id"],
+            "is_typing": event["is_typing"]
+        }))
+
+    async def presence(self, event):
+        if event["user_id"] == self.user.id:
+            return
+
+        await self.send(json.dumps({
+            "type": "presence",
+            "user_id": event["user_id"],
+            "is_online": event["is_online"],
+            "last_seen": event["last_seen"]
+        }))
+
+    async def entitlement_changed(self, event):
+        # Payment verified or subscription expired: reload from the DB
+        user_id = event["user_id"]
+        forget_local_entitlement(user_id)
+
+        for context in self.open_contexts():
+            if context.is_participant(user_id):
+                await sync_to_async(context.load_entitlement)(user_id)
+
+    async def user_changed(self, event):
+        user_id = event["user_id"]
+
+        # 🔹 Only this socket's user and partners with a loaded room matter
+        if user_id != self.user.id and not any(
+            context.is_participant(user_id) for context in self.open_contexts()
+        ):
+            return
+
+        user = await sync_to_async(CustomUser.objects.filter(id=user_id).first)()
+
+        for context in self.open_contexts():
+            if user is not None and context.is_participant(user_id):
+                context.set_user(user)
+
+        if user_id != self.user.id:
+            return
+
+        if user is None or not user.is_active or user.is_deleted:
+            await self.close(code=4001)
+            return
+
+        self.user = user
+
+    async def broadcast_presence(self, is_online):
+        await self.channel_layer.group_send(
+            presence_group_name(self.user.id),
+            presence_event(self.user.id, is_online)
+        )
+
     # =====================================================
     # 🔹 DATABASE HELPERS
     # =====================================================
-    @sync_to_async
-    def get_chat_room(self):
-        try:
-            return ChatRoom.objects.select_related(
-                "user1", "user2"
-            ).get(id=self.room_id)
-        except ChatRoom.DoesNotExist:
-            return None
-
-    @sync_to_async
-    def get_receiver(self, sender):
-        if self.chat_room.user1_id == sender.id:
-            return self.chat_room.user2
-        return self.chat_room.user1
-
     @sync_to_async
     def create_message(
         self,
+        chat_room,
         sender,
         receiver,
         message_type,
@@ -225,43 +381,265 @@ class ChatConsumer(AsyncWebsocketConsumer):
         question_id,
         answer_index
     ):
-        return ChatMessage.objects.create(
-            chat_room=self.chat_room,
-            sender=sender,
-            receiver=receiver,
-            message_type=message_type,
-            message_text=message_text,
-            predefined_question_id=question_id,
-            predefined_answer_index=answer_index
-        )
+        with transaction.atomic():
+            message = ChatMessage.objects.create(
+                chat_room=chat_room,
+                sender=sender,
+                receiver=receiver,
+                message_type=message_type,
+                message_text=message_text,
+                predefined_question_id=question_id,
+                predefined_answer_index=answer_index
+            )
+            record_unread([message])
+            record_last_message([message])
+
+        return message
 
     @sync_to_async
-    def delete_message(self, message_id, user):
+    def delete_message(self, chat_room, message_id, user):
         try:
             message = ChatMessage.objects.get(
                 id=message_id,
-                chat_room=self.chat_room,
+                chat_room=chat_room,
                 sender=user  # 🔐 only sender can delete
             )
-            message.delete()
+            with transaction.atomic():
+                forget_last_message(message)
+                message.delete()
+                forget_unread(message)
             return True
-        except ChatMessage.DoesNotExist:
+        except (ChatMessage.DoesNotExist, ValueError, TypeError):
             return False
-        
+
+    @sync_to_async
+    def get_room_message(self, chat_room, message_id):
+        try:
+            return ChatMessage.objects.only("id", "created_at").get(
+                id=message_id,
+                chat_room=chat_room
+            )
+        except (ChatMessage.DoesNotExist, ValueError, TypeError):
+            return None
+
     @sync_to_async
-    def send_firebase_notification(self, sender, receiver, message_text, room_id):
+    def send_firebase_notification(self, message):
         # If receiver has no FCM token, skip
-        if not getattr(receiver, "fcm_token", None):
+        if not getattr(message.receiver, "fcm_token", None):
             return
 
-        send_push_notification(
-            token=receiver.fcm_token,
-            title=f"New message from {sender.name or 'Someone'}",
-            body=message_text[:100],  # limit length
-            data={
-                "type": "chat",
-                "room_id": str(room_id),
-                "sender_id": str(sender.id),
-            }
+        queue_chat_message_push(message)
+
+
+class ChatConsumer(ChatRoomActionsMixin, AsyncWebsocketConsumer):
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        self.room_id = self.scope["url_route"]["kwargs"]["room_id"]
+
+        if not self.user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        # 🔹 Room, participants and entitlements, loaded once per connection
+        self.context = await sync_to_async(ChatRoomContext.load)(self.room_id)
+        if not self.context:
+            await self.close(code=4004)
+            return
+
+        if not self.context.is_participant(self.user.id):
+            await self.close(code=4003)
+            return
+
+        self.contexts = {self.context.room.id: self.context}
+        self.chat_room = self.context.room
+        self.room_group_name = room_group_name(self.room_id)
+
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+
+        for user_id in self.context.participant_ids:
+            await self.channel_layer.group_add(
+                presence_group_name(user_id),
+                self.channel_name
+            )
+
+        await self.accept()
+
+        self.last_typing_at = {}
+
+        # 🟢 Presence: partners' sockets are in this user's presence group
+        if await connection_opened(self.user.id, self.channel_name):
+            await self.broadcast_presence(True)
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, "room_group_name"):
+            return
+
+        if await connection_closed(self.user.id, self.channel_name):
+            await self.broadcast_presence(False)
+
+        await self.channel_layer.group_discard(
+            self.room_group_name,
+            self.channel_name
         )
 
+        for user_id in self.context.participant_ids:
+            await self.channel_layer.group_discard(
+                presence_group_name(user_id),
+                self.channel_name
+            )
+
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+
+        if data.get("action") == "heartbeat":
+            await self.handle_heartbeat()
+            return
+
+        await self.handle_room_action(self.context, data)
+
+    async def room_deleted(self, event):
+        await self.close(code=4004)
+
+
+class UserChatConsumer(ChatRoomActionsMixin, AsyncWebsocketConsumer):
+    """
+    One socket for all of a user's chat rooms (ws/chat/).
+
+    Frames are ChatConsumer frames plus a "room_id". The socket joins the
+    user's own user and presence groups and, per room, the room group and
+    the partner's presence group, so it also carries notifications, match
+    request updates and newly created rooms. Room contexts are loaded on
+    first use.
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+
+        if not self.user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        self.contexts = {}
+        self.last_typing_at = {}
+
+        # 🔹 {room_id: partner_id}, one query
+        self.rooms = await sync_to_async(user_room_partners)(self.user.id)
+
+        groups = self.own_groups()
+        for room_id, partner_id in self.rooms.items():
+            groups.update(self.room_groups(room_id, partner_id))
+        await self.join_groups(groups)
+
+        await self.accept()
+
+        # 🟢 Presence: partners' sockets are in this user's presence group
+        if await connection_opened(self.user.id, self.channel_name):
+            await self.broadcast_presence(True)
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, "rooms"):
+            return
+
+        if await connection_closed(self.user.id, self.channel_name):
+            await self.broadcast_presence(False)
+
+        groups = self.own_groups()
+        for room_id, partner_id in self.rooms.items():
+            groups.update(self.room_groups(room_id, partner_id))
+        await self.leave_groups(groups)
+
+    def own_groups(self):
+        return {user_group_name(self.user.id), presence_group_name(self.user.id)}
+
+    def room_groups(self, room_id, partner_id):
+        return {room_group_name(room_id), presence_group_name(partner_id)}
+
+    async def join_groups(self, groups):
+        await asyncio.gather(*[
+            self.channel_layer.group_add(group, self.channel_name)
+            for group in groups
+        ])
+
+    async def leave_groups(self, groups):
+        await asyncio.gather(*[
+            self.channel_layer.group_discard(group, self.channel_name)
+            for group in groups
+        ])
+
+    async def get_context(self, room_id):
+        try:
+            room_id = int(room_id)
+        except (TypeError, ValueError):
+            return None
+
+        if room_id not in self.rooms:
+            return None
+
+        if room_id not in self.contexts:
+            context = await sync_to_async(ChatRoomContext.load)(room_id)
+            if not context or not context.is_participant(self.user.id):
+                return None
+            self.contexts[room_id] = context
+
+        return self.contexts[room_id]
+
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+
+        if data.get("action") == "heartbeat":
+            await self.handle_heartbeat()
+            return
+
+        room_id = data.get("room_id")
+        context = await self.get_context(room_id)
+        if not context:
+            await self.send_error("Invalid room_id", room_id)
+            return
+
+        await self.handle_room_action(context, data)
+
+    # =====================================================
+    # 🔹 USER-LEVEL EVENTS
+    # =====================================================
+    async def notification(self, event):
+        await self.send(json.dumps({
+            "type": "notification",
+            **event["notification"]
+        }))
+
+    async def match_request(self, event):
+        await self.send(json.dumps({
+            "type": "match_request",
+            **event["match_request"]
+        }))
+
+    async def room_created(self, event):
+        if event["room_id"] in self.rooms:
+            return
+
+        self.rooms[event["room_id"]] = event["partner_id"]
+        await self.join_groups(self.room_groups(event["room_id"], event["partner_id"]))
+
+        await self.send(json.dumps({
+            "type": "room_created",
+            "room_id": event["room_id"],
+            "user_id": event["partner_id"]
+        }))
+
+    async def room_deleted(self, event):
+        room_id = event["room_id"]
+        partner_id = self.rooms.pop(room_id, None)
+        if partner_id is None:
+            return
+
+        self.contexts.pop(room_id, None)
+        await self.leave_groups(self.room_groups(room_id, partner_id))
+
+        await self.send(json.dumps({
+            "type": "room_deleted",
+            "room_id": room_id
+        }))
@@ -0,0 +1,88 @@
+from django.db.models import Q
+
+from auth_api.entitlements import get_subscription_expiry, is_subscription_active
+from .models import ChatRoom
+
+
+class ChatRoomContext:
+    """
+    What ChatConsumer needs to send a message in one room: the room, both
+    participants (with FCM tokens) and their subscription expiries.
+
+    Loaded once in connect() and refreshed piecewise by group events, so
+    sending a message reads nothing from the database.
+    """
+
+    def __init__(self, room):
+        self.room = room
+        self.participants = {
+            room.user1_id: room.user1,
+            room.user2_id: room.user2,
+        }
+        self.subscription_expiries = {}
+
+    @classmethod
+    def load(cls, room_id):
+        room = (
+            ChatRoom.objects
+            .select_related("user1", "user2")
+            .filter(id=room_id)
+            .first()
+        )
+        if not room:
+            return None
+
+        context = cls(room)
+        for user_id in context.participant_ids:
+            context.load_entitlement(user_id)
+
+        return context
+
+    @property
+    def participant_ids(self):
+        return tuple(self.participants)
+
+    def is_participant(self, user_id):
+        return user_id in self.participants
+
+    def other(self, user_id):
+        if self.room.user1_id == user_id:
+            return self.room.user2
+        return self.room.user1
+
+    def is_available(self, user_id):
+        user = self.participants[user_id]
+        return user.is_active and not user.is_deleted
+
+    def is_subscribed(self, user_id):
+        # The expiry is checked per message, so a lapse needs no event
+        return is_subscription_active(self.subscription_expiries.get(user_id))
+
+    def load_entitlement(self, user_id):
+        self.subscription_expiries[user_id] = get_subscription_expiry(user_id)
+
+    def set_user(self, user):
+        """
+        Swap in a freshly loaded participant (after a user_changed event)
+        """
+        self.participants[user.id] = user
+        if self.room.user1_id == user.id:
+            self.room.user1 = user
+        else:
+            self.room.user2 = user
+
+
+def user_room_partners(user_id):
+    """
+    {room_id: partner_id} for every chat room of user_id
+    """
+    rooms = (
+        ChatRoom.objects
+        .filter(Q(user1_id=user_id) | Q(user2_id=user_id))
+        .values_list("id", "user1_id", "user2_id")
+    )
+
+    return {
+        room_id: user2_id if user1_id == user_id else user1_id
+        for room_id, user1_id, user2_id in rooms
+    }
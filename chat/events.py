@@ -0,0 +1,154 @@
+"""
+Channel-layer events for open chat sockets.
+
+Groups:
+
+- chat_<room_id>: room events (messages, reads, typing, room deletion)
+- presence_<user_id>: what a user's partners need to know about them
+  (presence, account changes, entitlement changes). Joined by the
+  user's own sockets and by the sockets of everyone they chat with, so
+  changes made elsewhere (payments, account deactivation) reach the
+  sockets that cache that state.
+- user_<user_id>: the user's personal events (notifications, match
+  request updates, new rooms), joined by their UserChatConsumer only.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+
+def room_group_name(room_id):
+    return f"chat_{room_id}"
+
+
+def user_group_name(user_id):
+    return f"user_{user_id}"
+
+
+def presence_group_name(user_id):
+    return f"presence_{user_id}"
+
+
+def send_group_event(group, event):
+    # Best effort: a missed event only delays a refresh
+    try:
+        async_to_sync(get_channel_layer().group_send)(group, event)
+    except Exception:
+        logger.exception("Could not send %s to %s", event.get("type"), group)
+
+
+def send_group_events(group_events):
+    """
+    send_group_event() for many (group, event) pairs in one event loop
+    hop, for bulk jobs
+    """
+    async def send_all():
+        channel_layer = get_channel_layer()
+        for group, event in group_events:
+            try:
+                await channel_layer.group_send(group, event)
+            except Exception:
+                logger.exception("Could not send %s to %s", event.get("type"), group)
+
+    if group_events:
+        async_to_sync(send_all)()
+
+
+def send_group_event_on_commit(group, event):
+    transaction.on_commit(lambda: send_group_event(group, event))
+
+
+def notify_user_changed(user_id):
+    """
+    Account state (active / deleted / FCM token / name) changed
+    """
+    send_group_event_on_commit(
+        presence_group_name(user_id),
+        {"type": "user_changed", "user_id": user_id}
+    )
+
+
+def notify_user_rooms_deleted(user_id):
+    """
+    Call before deleting a user (their chat rooms cascade)
+    """
+    from .models import ChatRoom
+
+    room_ids = list(
+        ChatRoom.objects
+        .filter(Q(user1_id=user_id) | Q(user2_id=user_id))
+        .values_list("id", flat=True)
+    )
+
+    notify_rooms_deleted(room_ids)
+
+
+def notify_rooms_deleted(room_ids):
+    """
+    Call before deleting chat rooms in bulk
+    """
+    events = [
+        (room_group_name(room_id), {"type": "room_deleted", "room_id": room_id})
+        for room_id in room_ids
+    ]
+    transaction.on_commit(lambda: send_group_events(events))
+
+
+def notify_notification(notification):
+    send_group_event_on_commit(
+        user_group_name(notification.recipient_id),
+        {
+            "type": "notification",
+            "recipient_id": notification.recipient_id,
+            "notification": {
+                "id": notification.id,
+                "notification_type": notification.notification_type,
+                "title": notification.title,
+                "message": notification.message,
+                "sender_id": notification.sender_id,
+                "match_request_id": notification.match_request_id,
+                "created_at": notification.created_at.isoformat(),
+            },
+        }
+    )
+
+
+def notify_match_request(match_request):
+    """
+    A match request was sent, accepted or rejected: tell both users
+    """
+    for user_id in (match_request.from_user_id, match_request.to_user_id):
+        send_group_event_on_commit(
+            user_group_name(user_id),
+            {
+                "type": "match_request",
+                "recipient_id": user_id,
+                "match_request": {
+                    "id": match_request.id,
+                    "status": match_request.status,
+                    "from_user_id": match_request.from_user_id,
+                    "to_user_id": match_request.to_user_id,
+                },
+            }
+        )
+
+
+def notify_room_created(room):
+    for user_id, partner_id in (
+        (room.user1_id, room.user2_id),
+        (room.user2_id, room.user1_id),
+    ):
+        send_group_event_on_commit(
+            user_group_name(user_id),
+            {
+                "type": "room_created",
+                "recipient_id": user_id,
+                "room_id": room.id,
+                "partner_id": partner_id,
+            }
+        )
@@ -0,0 +1,354 @@
+"""
+Buffered chat message persistence (settings.CHAT_MESSAGE_BUFFERING).
+
+With buffering on, ChatConsumer doesn't INSERT each message. Instead:
+
+1. the message gets its primary key from a block of ids reserved from
+   the chat_chatmessage sequence, and its created_at from the clock
+2. with CHAT_MESSAGE_DURABLE, it is journaled to a Redis hash
+3. the consumer fans it out to the room group straight away
+4. the per-process buffer writes pending messages with one bulk_create
+   every CHAT_MESSAGE_FLUSH_INTERVAL seconds (or CHAT_MESSAGE_FLUSH_SIZE
+   messages), then queues their pushes and clears the journal entries
+
+If a process dies between 2 and 4, replay_journal() (run periodically
+by chat.tasks.replay_chat_message_journal) inserts the journaled
+messages. Inserts are idempotent: each message id is locked for the
+transaction and only ids not yet stored are inserted, so a message
+written twice (a replay racing a retried flush) gets its unread count,
+last message update and push once. A message whose room or user was
+deleted in the meantime is logged and dropped rather than failing its
+whole batch.
+
+A failed flush is retried with exponential backoff. After
+FLUSH_MAX_RETRIES failures in a row the batch is left to the journal
+replay (or dropped, without CHAT_MESSAGE_DURABLE).
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import timedelta
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from auth_api.models import CustomUser
+from .models import ChatMessage, ChatRoom
+from .push import queue_chat_message_push
+from .services import record_last_message, record_unread
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_KEY = "chat_message_journal"
+
+# Journal entries younger than this may still be in a live buffer
+JOURNAL_REPLAY_GRACE = 60
+
+ID_BLOCK_SIZE = 100
+
+FLUSH_MAX_RETRIES = 5
+FLUSH_RETRY_MAX_DELAY = 30  # seconds
+
+# Fields written to the journal and restored on replay
+JOURNAL_FIELDS = (
+    "id",
+    "chat_room_id",
+    "sender_id",
+    "receiver_id",
+    "message_type",
+    "message_text",
+    "predefined_question_id",
+    "predefined_answer_index",
+)
+
+
+def buffering_enabled():
+    return getattr(settings, "CHAT_MESSAGE_BUFFERING", False)
+
+
+def _journal_url():
+    return getattr(settings, "CHAT_MESSAGE_JOURNAL_URL", "redis://127.0.0.1:6379/4")
+
+
+def reserve_message_ids(count):
+    """
+    Reserve `count` ids from the ChatMessage primary key sequence
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+            "FROM generate_series(1, %s)",
+            [ChatMessage._meta.db_table, count]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def journal_entry(message):
+    entry = {field: getattr(message, field) for field in JOURNAL_FIELDS}
+    entry["created_at"] = message.created_at.isoformat()
+    return json.dumps(entry)
+
+
+def message_from_journal(raw):
+    entry = json.loads(raw)
+    entry["created_at"] = parse_datetime(entry["created_at"])
+    return ChatMessage(**entry)
+
+
+def existing_messages(messages):
+    """
+    The messages whose room, sender and receiver still exist
+    """
+    room_ids = set(
+        ChatRoom.objects
+        .filter(id__in={m.chat_room_id for m in messages})
+        .values_list("id", flat=True)
+    )
+    user_ids = set(
+        CustomUser.objects
+        .filter(id__in={m.sender_id for m in messages} | {m.receiver_id for m in messages})
+        .values_list("id", flat=True)
+    )
+
+    kept = [
+        m for m in messages
+        if m.chat_room_id in room_ids and m.sender_id in user_ids and m.receiver_id in user_ids
+    ]
+    if len(kept) < len(messages):
+        logger.warning(
+            "Dropping %s chat messages whose room or user was deleted",
+            len(messages) - len(kept)
+        )
+    return kept
+
+
+def lock_message_ids(ids):
+    """
+    Transaction-level advisory locks on message ids, so two writers of
+    the same message (a flush and a journal replay) take turns
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(id) FROM unnest(%s::bigint[]) AS id ORDER BY id",
+            [sorted(ids)]
+        )
+
+
+def insert_messages(messages):
+    """
+    Insert the messages not stored yet, with their bookkeeping. Returns
+    the ones inserted.
+    """
+    if not messages:
+        return []
+
+    with transaction.atomic():
+        lock_message_ids([m.id for m in messages])
+
+        stored = set(
+            ChatMessage.objects
+            .filter(id__in=[m.id for m in messages])
+            .values_list("id", flat=True)
+        )
+        new = [m for m in messages if m.id not in stored]
+
+        ChatMessage.objects.bulk_create(new)
+        record_unread(new)
+        record_last_message(new)
+
+    return new
+
+
+def store_messages(messages):
+    """
+    Insert messages with their unread / last message bookkeeping and
+    return the ones this call stored (not those already there). Call
+    outside a transaction: foreign keys are checked at commit, so a row
+    whose room or user is deleted concurrently only fails there. The
+    batch is then retried row by row and the failing rows are dropped.
+    """
+    messages = existing_messages(messages)
+
+    try:
+        return insert_messages(messages)
+    except IntegrityError:
+        logger.warning("Could not store %s chat messages at once, retrying one by one", len(messages))
+
+    stored = []
+    for message in messages:
+        try:
+            stored.extend(insert_messages([message]))
+        except IntegrityError:
+            logger.exception(
+                "Dropping chat message %s for room %s", message.id, message.chat_room_id
+            )
+    return stored
+
+
+def write_messages(messages):
+    for message in store_messages(messages):
+        queue_chat_message_push(message)
+
+
+class ChatMessageBuffer:
+
+    def __init__(self):
+        self.pending = {}
+        self.ids = deque()
+        self.flush_task = None
+        self.flush_lock = asyncio.Lock()
+        self.flush_failures = 0
+        self.journal = None
+
+        self.flush_interval = getattr(settings, "CHAT_MESSAGE_FLUSH_INTERVAL", 0.2)
+        self.flush_size = getattr(settings, "CHAT_MESSAGE_FLUSH_SIZE", 200)
+        self.durable = getattr(settings, "CHAT_MESSAGE_DURABLE", True)
+
+    async def next_id(self):
+        if not self.ids:
+            self.ids.extend(await sync_to_async(reserve_message_ids)(ID_BLOCK_SIZE))
+        return self.ids.popleft()
+
+    def get_journal(self):
+        if self.journal is None:
+            self.journal = aioredis.from_url(_journal_url())
+        return self.journal
+
+    async def add(self, **fields):
+        """
+        Build a message with its final id and created_at, journal it and
+        queue it for the next flush. The returned message is unsaved.
+        """
+        message = ChatMessage(
+            id=await self.next_id(),
+            created_at=timezone.now(),
+            **fields
+        )
+
+        if self.durable:
+            await self.get_journal().hset(JOURNAL_KEY, message.id, journal_entry(message))
+
+        self.pending[message.id] = message
+
+        if len(self.pending) >= self.flush_size:
+            await self.flush()
+        elif self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+        return message
+
+    async def discard(self, message_id, chat_room_id, sender_id):
+        """
+        Drop a message that hasn't been flushed yet. Returns True if it was
+        pending (and belonged to this room and sender).
+        """
+        try:
+            message_id = int(message_id)
+        except (TypeError, ValueError):
+            return False
+
+        message = self.pending.get(message_id)
+        if not message or message.chat_room_id != chat_room_id or message.sender_id != sender_id:
+            return False
+
+        del self.pending[message_id]
+        if self.durable:
+            await self.get_journal().hdel(JOURNAL_KEY, message_id)
+        return True
+
+    async def flush_later(self, delay=None):
+        await asyncio.sleep(self.flush_interval if delay is None else delay)
+        await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+
+            batch = list(self.pending.values())
+            self.pending.clear()
+
+            try:
+                await sync_to_async(write_messages)(batch)
+            except Exception:
+                self.flush_failures += 1
+
+                if self.flush_failures > FLUSH_MAX_RETRIES:
+                    # 🔹 Give up: the journal replay stores them later
+                    logger.exception(
+                        "Could not flush %s chat messages, leaving them to the journal replay%s",
+                        len(batch), "" if self.durable else " (not journaled, they are lost)"
+                    )
+                    self.flush_failures = 0
+                    return
+
+                delay = min(
+                    self.flush_interval * 2 ** self.flush_failures,
+                    FLUSH_RETRY_MAX_DELAY
+                )
+                logger.exception(
+                    "Could not flush %s chat messages, retrying in %.1fs", len(batch), delay
+                )
+                for message in batch:
+                    self.pending.setdefault(message.id, message)
+                self.flush_task = asyncio.ensure_future(self.flush_later(delay))
+                return
+
+            self.flush_failures = 0
+
+            if self.durable:
+                try:
+                    await self.get_journal().hdel(JOURNAL_KEY, *[m.id for m in batch])
+                except Exception:
+                    # Replay skips messages that are already stored
+                    logger.exception("Could not clear chat message journal")
+
+
+_buffer = None
+
+
+def get_message_buffer():
+    global _buffer
+
+    if _buffer is None:
+        _buffer = ChatMessageBuffer()
+    return _buffer
+
+
+def replay_journal(grace=JOURNAL_REPLAY_GRACE):
+    """
+    Persist journaled messages left behind by a crashed process.
+    Returns the number of messages replayed.
+    """
+    client = redis.Redis.from_url(_journal_url())
+    cutoff = timezone.now() - timedelta(seconds=grace)
+
+    messages = []
+    for raw in client.hvals(JOURNAL_KEY):
+        message = message_from_journal(raw)
+        if message.created_at < cutoff:
+            messages.append(message)
+
+    if not messages:
+        return 0
+
+    stored = set(
+        ChatMessage.objects
+        .filter(id__in=[m.id for m in messages])
+        .values_list("id", flat=True)
+    )
+    missing = [m for m in messages if m.id not in stored]
+
+    # Pushes for these are stale by now, so only store them. Rows that
+    # can't be stored are dropped from the journal too.
+    stored = store_messages(missing)
+
+    client.hdel(JOURNAL_KEY, *[m.id for m in messages])
+
+    return len(stored)
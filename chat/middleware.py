@@ -1,19 +1,46 @@
 from urllib.parse import parse_qs
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
 
 
+def user_from_claims(user_id):
+    """
+    Stateless mode: the signed token is trusted for the connection's
+    lifetime. Deactivation still reaches open sockets as a user_changed
+    event.
+    """
+    from auth_api.user_cache import build_user
+
+    return build_user(("id", "is_active", "is_deleted"), [user_id, True, False])
+
+
 class JWTAuthMiddleware(BaseMiddleware):
 
     @database_sync_to_async
     def get_user(self, token):
         # ⬇️ IMPORT HERE (NOT at top)
         from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.settings import api_settings
+        from auth_api.models import CustomUser
+        from auth_api.user_cache import get_cached_user
 
         jwt_auth = JWTAuthentication()
         validated_token = jwt_auth.get_validated_token(token)
-        return jwt_auth.get_user(validated_token)
+        user_id = CustomUser._meta.pk.to_python(
+            validated_token[api_settings.USER_ID_CLAIM]
+        )
+
+        if getattr(settings, "CHAT_WS_AUTH_STATELESS", False):
+            return user_from_claims(user_id)
+
+        # 🔹 Shared with REST auth (auth_api.user_cache)
+        user = get_cached_user(user_id)
+        if user is None or not user.is_active:
+            return AnonymousUser()
+
+        return user
 
     async def __call__(self, scope, receive, send):
         query_string = scope.get("query_string", b"").decode()
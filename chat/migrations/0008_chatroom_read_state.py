@@ -0,0 +1,53 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:34
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_existing_messages_read(apps, schema_editor):
+    # Nothing tracked reads before, so start every room fully read
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    now = timezone.now()
+
+    ChatRoom.objects.update(user1_last_read_at=now, user2_last_read_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_alter_chatmessage_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='user1_last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='user1_last_read_message_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='user1_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='user2_last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='user2_last_read_message_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='user2_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(mark_existing_messages_read, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_message(apps, schema_editor):
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+
+    latest = ChatMessage.objects.filter(
+        chat_room=OuterRef("pk")
+    ).order_by("-created_at", "-id")
+
+    ChatRoom.objects.update(
+        last_message_id=Subquery(latest.values("id")[:1]),
+        last_message_text=Subquery(latest.values("message_text")[:1]),
+        last_message_time=Subquery(latest.values("created_at")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_chatroom_read_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_text',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['user1', '-last_message_time'], name='chat_room_user1_last_msg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['user2', '-last_message_time'], name='chat_room_user2_last_msg_idx'),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from auth_api.models import CustomUser
 from match.models import MatchRequest
 from django.core.exceptions import ValidationError
@@ -25,12 +26,50 @@ class ChatRoom(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # 🔹 Read state per participant: a watermark (last message read) and a
+    # denormalized count of messages received after it
+    user1_last_read_message_id = models.BigIntegerField(null=True, blank=True)
+    user1_last_read_at = models.DateTimeField(null=True, blank=True)
+    user1_unread_count = models.PositiveIntegerField(default=0)
+
+    user2_last_read_message_id = models.BigIntegerField(null=True, blank=True)
+    user2_last_read_at = models.DateTimeField(null=True, blank=True)
+    user2_unread_count = models.PositiveIntegerField(default=0)
+
+    # 🔹 Denormalized latest message, for the chat list
+    last_message_id = models.BigIntegerField(null=True, blank=True)
+    last_message_text = models.TextField(null=True, blank=True)
+    last_message_time = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         unique_together = ("user1", "user2")
+        indexes = [
+            # 🔹 Chat list: a user's rooms, latest conversation first
+            models.Index(
+                fields=["user1", "-last_message_time"],
+                name="chat_room_user1_last_msg_idx"
+            ),
+            models.Index(
+                fields=["user2", "-last_message_time"],
+                name="chat_room_user2_last_msg_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"ChatRoom {self.user1.email} & {self.user2.email}"
 
+    def member_prefix(self, user_id):
+        """
+        "user1" / "user2": prefix of the per-participant fields for user_id
+        """
+        return "user1" if self.user1_id == user_id else "user2"
+
+    def last_read_at(self, user_id):
+        return getattr(self, f"{self.member_prefix(user_id)}_last_read_at")
+
+    def unread_count(self, user_id):
+        return getattr(self, f"{self.member_prefix(user_id)}_unread_count")
+
 
 
 class ChatMessage(models.Model):
@@ -79,10 +118,72 @@ class ChatMessage(models.Model):
 
     is_read = models.BooleanField(default=False)
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: buffered writes set it when the message is sent
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # 🔹 Chat history keyset pagination
+            models.Index(
+                fields=["chat_room", "created_at", "id"],
+                name="chat_msg_room_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.sender.email} → {self.receiver.email} ({self.message_type})"
+
+
+class PushNotification(models.Model):
+    """
+    Outbox row for one FCM push, delivered in batches by
+    chat.tasks.deliver_push_notifications
+    """
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    )
+
+    recipient = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="push_notifications"
+    )
+
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+
+    # Pending pushes with the same key for the same recipient are merged
+    collapse_key = models.CharField(max_length=100, blank=True, default="")
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default="pending"
+    )
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="push_status_next_idx"
+            ),
+            models.Index(
+                fields=["recipient", "collapse_key", "status"],
+                name="push_recipient_collapse_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Push to {self.recipient_id}: {self.title} ({self.status})"
@@ -0,0 +1,58 @@
+from auth_api.pagination import KeysetPagination
+
+
+class ChatHistoryPagination(KeysetPagination):
+    """
+    Keyset pagination over (created_at, id) for a chat room.
+
+    - no cursor      newest page
+    - ?before=<c>    the page of messages older than <c> ("load older")
+    - ?after=<c>     messages newer than <c>, oldest first (catch-up sync)
+
+    Every page is returned oldest first. `has_more` refers to the
+    requested direction: older messages for the first and `before` pages,
+    newer ones for `after`.
+    """
+    page_size = 30
+    max_page_size = 100
+    before_query_param = "before"
+    after_query_param = "after"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        time_field, id_field = self.keyset_fields
+        page_size = self.get_page_size(request)
+
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+
+        if after:
+            queryset = (
+                queryset
+                .filter(self.seek_filter(*self.decode_cursor(after), older=False))
+                .order_by(time_field, id_field)
+            )
+        else:
+            queryset = queryset.order_by(f"-{time_field}", f"-{id_field}")
+            if before:
+                queryset = queryset.filter(self.seek_filter(*self.decode_cursor(before)))
+
+        rows = list(queryset[:page_size + 1])
+
+        self.has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if not after:
+            rows.reverse()
+
+        self.before_cursor = self.encode_cursor(rows[0]) if rows else before
+        self.after_cursor = self.encode_cursor(rows[-1]) if rows else after
+
+        return rows
+
+    def get_paginated_data(self, data):
+        return {
+            "before_cursor": self.before_cursor,
+            "after_cursor": self.after_cursor,
+            "has_more": self.has_more,
+            "results": data,
+        }
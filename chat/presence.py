@@ -0,0 +1,203 @@
+"""
+Online presence for chat users, kept in Redis (settings.CHAT_PRESENCE_URL).
+
+Each open socket is a member of its user's presence sorted set, scored
+with the time its lease runs out. ChatConsumer adds the member on
+connect, renews it on every "heartbeat" frame and removes it on
+disconnect; a socket that vanishes without disconnecting (a killed
+process) simply stops being renewed and ages out after
+CHAT_PRESENCE_TTL seconds.
+
+A user is online while any of their leases is live. When the last one
+goes, their last_seen time is kept in a hash so the chat list can show
+it. Redis being down never breaks chat: presence reads as offline.
+
+Leases that age out are found by the sweep_chat_presence task: every
+online user is also in the PRESENCE_USERS_KEY sorted set, scored with
+their latest lease end, and the sweep takes out the users whose score
+has passed, records their last_seen and reports them as offline.
+"""
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_KEY = "chat_presence_last_seen"
+PRESENCE_USERS_KEY = "chat_presence_users"
+
+_client = None
+_async_client = None
+
+
+def presence_ttl():
+    return getattr(settings, "CHAT_PRESENCE_TTL", 60)
+
+
+def _presence_url():
+    return getattr(settings, "CHAT_PRESENCE_URL", "redis://127.0.0.1:6379/5")
+
+
+def _get_client():
+    global _client
+
+    if _client is None:
+        _client = redis.Redis.from_url(_presence_url())
+    return _client
+
+
+def _get_async_client():
+    global _async_client
+
+    if _async_client is None:
+        _async_client = aioredis.from_url(_presence_url())
+    return _async_client
+
+
+def presence_key(user_id):
+    return f"chat_presence_{user_id}"
+
+
+async def connection_opened(user_id, channel_name):
+    """
+    Start (or renew) the lease of one socket. Returns True if this made
+    the user come online.
+    """
+    key = presence_key(user_id)
+    now = time.time()
+    ttl = presence_ttl()
+
+    try:
+        async with _get_async_client().pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, "-inf", now)
+            pipe.zcard(key)
+            pipe.zadd(key, {channel_name: now + ttl})
+            pipe.expire(key, ttl)
+            pipe.zadd(PRESENCE_USERS_KEY, {user_id: now + ttl}, gt=True)
+            _, live, _, _, _ = await pipe.execute()
+    except Exception:
+        logger.exception("Could not record presence for user %s", user_id)
+        return False
+
+    return live == 0
+
+
+# A heartbeat is a renewal: it also reports a user whose lease had lapsed
+connection_renewed = connection_opened
+
+
+async def connection_closed(user_id, channel_name):
+    """
+    End the lease of one socket. Returns True if the user went offline.
+    """
+    key = presence_key(user_id)
+    now = time.time()
+
+    try:
+        async with _get_async_client().pipeline(transaction=True) as pipe:
+            pipe.zrem(key, channel_name)
+            pipe.zremrangebyscore(key, "-inf", now)
+            pipe.zcard(key)
+            _, _, live = await pipe.execute()
+
+            if live == 0:
+                async with _get_async_client().pipeline(transaction=True) as pipe:
+                    pipe.hset(LAST_SEEN_KEY, user_id, int(now))
+                    pipe.zrem(PRESENCE_USERS_KEY, user_id)
+                    await pipe.execute()
+    except Exception:
+        logger.exception("Could not clear presence for user %s", user_id)
+        return False
+
+    return live == 0
+
+
+def get_presence(user_ids):
+    """
+    {user_id: {"is_online": bool, "last_seen": datetime | None}} for many
+    users in one round trip
+    """
+    user_ids = list(user_ids)
+    presence = {
+        user_id: {"is_online": False, "last_seen": None}
+        for user_id in user_ids
+    }
+
+    if not user_ids:
+        return presence
+
+    now = time.time()
+
+    try:
+        pipe = _get_client().pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zcount(presence_key(user_id), now, "+inf")
+        pipe.hmget(LAST_SEEN_KEY, user_ids)
+        *live_counts, last_seen = pipe.execute()
+    except Exception:
+        logger.exception("Could not read presence")
+        return presence
+
+    for user_id, live, seen in zip(user_ids, live_counts, last_seen):
+        presence[user_id]["is_online"] = live > 0
+        if seen is not None:
+            presence[user_id]["last_seen"] = datetime.fromtimestamp(
+                int(seen), tz=dt_timezone.utc
+            )
+
+    return presence
+
+
+def sweep_expired_presence():
+    """
+    Take out the users whose last lease ran out without a disconnect and
+    record their last_seen. Returns {user_id: last_seen timestamp}.
+    """
+    now = time.time()
+    client = _get_client()
+
+    try:
+        # 🔹 Read and remove in one transaction: a user renewing after
+        # this gets a fresh entry and comes back online
+        pipe = client.pipeline(transaction=True)
+        pipe.zrangebyscore(PRESENCE_USERS_KEY, "-inf", now, withscores=True)
+        pipe.zremrangebyscore(PRESENCE_USERS_KEY, "-inf", now)
+        expired, _ = pipe.execute()
+
+        # Last seen at their last heartbeat, not when the lease ran out
+        offline = {
+            int(user_id): int(lease_end - presence_ttl())
+            for user_id, lease_end in expired
+        }
+
+        if offline:
+            client.hset(LAST_SEEN_KEY, mapping=offline)
+    except Exception:
+        logger.exception("Could not sweep presence")
+        return {}
+
+    return offline
+
+
+def format_last_seen(timestamp):
+    # Same format as the chat list's last_seen (a DRF DateTimeField)
+    return serializers.DateTimeField().to_representation(
+        datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+    )
+
+
+def presence_event(user_id, is_online, last_seen=None):
+    if not is_online and last_seen is None:
+        last_seen = time.time()
+
+    return {
+        "type": "presence",
+        "user_id": user_id,
+        "is_online": is_online,
+        "last_seen": None if is_online else format_last_seen(last_seen),
+    }
@@ -0,0 +1,268 @@
+"""
+Push notification outbox.
+
+Views and the chat consumer call queue_push_notification(), which only
+writes a PushNotification row. The deliver_push_notifications Celery
+task drains the outbox in batches through FCM's send_each API, retrying
+failures with exponential backoff. A batch is claimed (status
+"sending") before FCM is called and its outcome recorded afterwards, so
+no row locks are held during the network call.
+
+Pending pushes for the same recipient and collapse key (e.g. one chat
+room) are merged, so a burst of messages turns into one notification.
+
+The transport is pluggable via settings.PUSH_NOTIFICATION_TRANSPORT;
+FakePushTransport records messages in memory for offline testing.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import PushNotification
+
+logger = logging.getLogger(__name__)
+
+PUSH_BATCH_SIZE = 500  # FCM send_each limit
+PUSH_MAX_ATTEMPTS = 5
+PUSH_RETRY_BASE_DELAY = 30  # seconds, doubled per attempt
+PUSH_SEND_LEASE = 5 * 60  # seconds a claimed push may stay "sending"
+
+PUSH_DRAIN_LOCK = "push_notifications_drain"
+PUSH_DRAIN_LOCK_TIMEOUT = 60
+
+
+class PushResult:
+    def __init__(self, success, error=None, permanent=False):
+        self.success = success
+        self.error = error
+        # Permanent failures (bad / unregistered token) are not retried
+        self.permanent = permanent
+
+
+class FirebasePushTransport:
+
+    def send_each(self, pushes):
+        from firebase_admin import exceptions, messaging
+        from . import firebase  # noqa: F401 (initializes the app)
+
+        messages = [
+            messaging.Message(
+                notification=messaging.Notification(
+                    title=push["title"],
+                    body=push["body"],
+                ),
+                token=push["token"],
+                data=push["data"],
+            )
+            for push in pushes
+        ]
+
+        batch = messaging.send_each(messages)
+
+        return [
+            PushResult(
+                response.success,
+                error=str(response.exception) if response.exception else None,
+                permanent=isinstance(response.exception, (
+                    messaging.UnregisteredError,
+                    exceptions.InvalidArgumentError,
+                ))
+            )
+            for response in batch.responses
+        ]
+
+
+class FakePushTransport:
+    """
+    Records pushes instead of sending them. The list is per instance
+    (get_push_transport() builds one per batch), so a worker running
+    with this transport doesn't accumulate pushes.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def send_each(self, pushes):
+        self.sent.extend(pushes)
+        return [PushResult(True) for _ in pushes]
+
+
+def get_push_transport():
+    path = getattr(
+        settings,
+        "PUSH_NOTIFICATION_TRANSPORT",
+        "chat.push.FirebasePushTransport"
+    )
+    return import_string(path)()
+
+
+def queue_push_notification(user, title, body, data=None, collapse_key=""):
+    """
+    Store a push for `user` and schedule delivery after commit
+    """
+    if not user.fcm_token:
+        return None
+
+    # FCM data payload values must be strings
+    data = {key: str(value) for key, value in (data or {}).items()}
+
+    push = None
+    if collapse_key:
+        push = (
+            PushNotification.objects
+            .filter(recipient=user, collapse_key=collapse_key, status="pending", attempts=0)
+            .order_by("-id")
+            .first()
+        )
+
+    # 🔹 Coalesce: the latest message replaces the pending one, unless a
+    # worker claimed it in the meantime (the UPDATE re-checks the status)
+    if push and PushNotification.objects.filter(
+        id=push.id, status="pending", attempts=0
+    ).update(title=title, body=body, data=data):
+        push.title = title
+        push.body = body
+        push.data = data
+    else:
+        push = PushNotification.objects.create(
+            recipient=user,
+            title=title,
+            body=body,
+            data=data,
+            collapse_key=collapse_key
+        )
+
+    transaction.on_commit(schedule_push_delivery)
+    return push
+
+
+def queue_chat_message_push(message):
+    """
+    Push for a new chat message; bursts in one room collapse into one push
+    """
+    sender = message.sender
+
+    return queue_push_notification(
+        message.receiver,
+        title=f"New message from {sender.name or 'Someone'}",
+        body=message.message_text[:100],  # limit length
+        data={
+            "type": "chat",
+            "room_id": message.chat_room_id,
+            "sender_id": sender.id,
+        },
+        collapse_key=f"chat_{message.chat_room_id}"
+    )
+
+
+def schedule_push_delivery():
+    from .tasks import deliver_push_notifications
+
+    # Pushes queued before the drain starts share one run
+    if not cache.add(PUSH_DRAIN_LOCK, True, PUSH_DRAIN_LOCK_TIMEOUT):
+        return
+
+    try:
+        deliver_push_notifications.apply_async(countdown=1)
+    except Exception:
+        logger.exception("Could not queue push delivery")
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=PUSH_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+def claim_pushes(batch_size, now):
+    """
+    Lock a batch of due pushes and mark them "sending" until
+    now + PUSH_SEND_LEASE. Pushes left in "sending" by a crashed worker
+    become due again once their lease runs out.
+    """
+    with transaction.atomic():
+        pushes = list(
+            PushNotification.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("recipient")
+            .filter(status__in=("pending", "sending"), next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+
+        for push in pushes:
+            if push.status == "sending" and push.attempts >= PUSH_MAX_ATTEMPTS:
+                push.status = "failed"
+                push.last_error = push.last_error or "Delivery timed out"
+            elif push.recipient.fcm_token and not push.recipient.is_deleted:
+                # 🔹 Counted up front, so a push that keeps crashing its worker still runs out of attempts
+                push.status = "sending"
+                push.attempts += 1
+                push.next_attempt_at = now + timedelta(seconds=PUSH_SEND_LEASE)
+            else:
+                push.status = "failed"
+                push.last_error = "Recipient has no FCM token"
+
+        PushNotification.objects.bulk_update(
+            pushes,
+            ["status", "attempts", "next_attempt_at", "last_error"]
+        )
+
+    return pushes
+
+
+def deliver_pending(batch_size=PUSH_BATCH_SIZE, transport=None):
+    """
+    Send one batch of due pushes. Returns the number of pushes handled.
+
+    The batch is claimed in one short transaction and its outcome recorded
+    in another; FCM is called in between, with no row locks held.
+    """
+    transport = transport or get_push_transport()
+    now = timezone.now()
+
+    pushes = claim_pushes(batch_size, now)
+    sendable = [push for push in pushes if push.status == "sending"]
+
+    if not sendable:
+        return len(pushes)
+
+    try:
+        results = transport.send_each([
+            {
+                "token": push.recipient.fcm_token,
+                "title": push.title,
+                "body": push.body,
+                "data": push.data,
+            }
+            for push in sendable
+        ])
+    except Exception as e:
+        # 🔹 The whole batch failed; retry every push with backoff
+        logger.exception("Push transport failed for %d pushes", len(sendable))
+        results = [PushResult(False, error=str(e)) for _ in sendable]
+
+    now = timezone.now()
+
+    for push, result in zip(sendable, results):
+        if result.success:
+            push.status = "sent"
+            push.sent_at = now
+            push.last_error = ""
+        elif result.permanent or push.attempts >= PUSH_MAX_ATTEMPTS:
+            push.status = "failed"
+            push.last_error = result.error or ""
+        else:
+            push.status = "pending"
+            push.next_attempt_at = now + retry_delay(push.attempts)
+            push.last_error = result.error or ""
+
+    with transaction.atomic():
+        PushNotification.objects.bulk_update(
+            sendable,
+            ["status", "next_attempt_at", "last_error", "sent_at"]
+        )
+
+    return len(pushes)
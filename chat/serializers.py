@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from chat.models import ChatRoom, ChatMessage
+from auth_api.images import ImageVariantField
 
 
 class ChatUserListSerializer(serializers.Serializer):
@@ -7,9 +8,14 @@ class ChatUserListSerializer(serializers.Serializer):
     user_id = serializers.IntegerField()
     unique_id = serializers.CharField()
     name = serializers.CharField()
-    profile_image = serializers.ImageField(allow_null=True)
+    profile_image = ImageVariantField("thumb", allow_null=True)
     is_subscribed = serializers.BooleanField()
 
+    unread_count = serializers.IntegerField()
+
+    is_online = serializers.BooleanField()
+    last_seen = serializers.DateTimeField(allow_null=True)
+
     last_message = serializers.CharField(allow_null=True)
     last_message_time = serializers.DateTimeField(allow_null=True)
 
@@ -17,6 +23,7 @@ class ChatUserListSerializer(serializers.Serializer):
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     sender = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = ChatMessage
@@ -31,6 +38,11 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             "created_at",
         ]
 
+    def get_is_read(self, obj):
+        # Read once the receiver's watermark has reached the message
+        read_at = self.context.get("read_watermarks", {}).get(obj.receiver_id)
+        return read_at is not None and obj.created_at <= read_at
+
     def get_sender(self, obj):
         current_user = self.context.get("current_user")
 
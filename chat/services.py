@@ -1,16 +1,13 @@
-from auth_api.models import SubscriptionPayment
+from collections import Counter
 
-def is_user_subscribed(user):
-    return SubscriptionPayment.objects.filter(
-        user=user,
-        payment_status="success"
-    ).exists()
+from django.db import transaction
+from django.db.models import F, Q
 
+from auth_api.entitlements import is_user_subscribed
+from .models import ChatMessage, ChatRoom
 
-def can_send_message(sender, receiver, message_type):
-    sender_subscribed = is_user_subscribed(sender)
-    receiver_subscribed = is_user_subscribed(receiver)
 
+def check_chat_permission(sender_subscribed, receiver_subscribed, message_type):
     # Case 1: Non-subscriber → Subscriber
     if not sender_subscribed and receiver_subscribed:
         return False, "Upgrade your plan to start conversation"
@@ -30,3 +27,165 @@ def can_send_message(sender, receiver, message_type):
         return True, None
 
     return False, "Chat not allowed"
+
+
+def can_send_message(sender, receiver, message_type):
+    return check_chat_permission(
+        is_user_subscribed(sender),
+        is_user_subscribed(receiver),
+        message_type
+    )
+
+
+def record_unread(messages):
+    """
+    Bump the receivers' unread counters for newly stored messages, one
+    UPDATE per room
+    """
+    counts = Counter(
+        (message.chat_room_id, message.receiver_id)
+        for message in messages
+    )
+
+    rooms = ChatRoom.objects.in_bulk({room_id for room_id, _ in counts})
+
+    # A message read before it was stored (buffered writes) isn't unread
+    for message in messages:
+        room = rooms.get(message.chat_room_id)
+        read_at = room and room.last_read_at(message.receiver_id)
+        if read_at and message.created_at <= read_at:
+            counts[(message.chat_room_id, message.receiver_id)] -= 1
+
+    for (room_id, receiver_id), count in counts.items():
+        room = rooms.get(room_id)
+        if not room or count <= 0:
+            continue
+
+        field = f"{room.member_prefix(receiver_id)}_unread_count"
+        ChatRoom.objects.filter(id=room_id).update(**{field: F(field) + count})
+
+
+def forget_unread(message):
+    """
+    Undo record_unread() for a deleted message the receiver hadn't read
+    """
+    room = ChatRoom.objects.get(id=message.chat_room_id)
+    read_at = room.last_read_at(message.receiver_id)
+
+    if read_at and message.created_at <= read_at:
+        return
+
+    field = f"{room.member_prefix(message.receiver_id)}_unread_count"
+    ChatRoom.objects.filter(id=room.id, **{f"{field}__gt": 0}).update(
+        **{field: F(field) - 1}
+    )
+
+
+def _older_than(prefix, timestamp, pk):
+    # Rows whose {prefix}time / {prefix}id pair sorts before (timestamp, pk)
+    return (
+        Q(**{f"{prefix}time__isnull": True}) |
+        Q(**{f"{prefix}time__lt": timestamp}) |
+        Q(**{f"{prefix}time": timestamp, f"{prefix}id__lt": pk})
+    )
+
+
+def record_last_message(messages):
+    """
+    Point each room's last_message_* columns at the newest of `messages`,
+    unless the room already shows a newer one
+    """
+    latest = {}
+    for message in messages:
+        current = latest.get(message.chat_room_id)
+        if not current or (message.created_at, message.id) > (current.created_at, current.id):
+            latest[message.chat_room_id] = message
+
+    for room_id, message in latest.items():
+        (
+            ChatRoom.objects
+            .filter(_older_than("last_message_", message.created_at, message.id), id=room_id)
+            .update(
+                last_message_id=message.id,
+                last_message_text=message.message_text,
+                last_message_time=message.created_at,
+            )
+        )
+
+
+def forget_last_message(message):
+    """
+    When deleting `message`, fall back to the room's newest other message
+    if it was the one shown in the chat list. Call before the delete, while
+    message.id is still set.
+    """
+    previous = (
+        ChatMessage.objects
+        .filter(chat_room_id=message.chat_room_id)
+        .exclude(id=message.id)
+        .order_by("-created_at", "-id")
+        .only("id", "message_text", "created_at")
+        .first()
+    )
+
+    ChatRoom.objects.filter(
+        id=message.chat_room_id,
+        last_message_id=message.id
+    ).update(
+        last_message_id=previous and previous.id,
+        last_message_text=previous and previous.message_text,
+        last_message_time=previous and previous.created_at,
+    )
+
+
+def mark_room_read(room, user_id, message):
+    """
+    Move user_id's read watermark up to `message` and recount what is
+    left unread after it. Returns False if the watermark was already past
+    it.
+    """
+    prefix = room.member_prefix(user_id)
+    read_at = message.created_at
+
+    with transaction.atomic():
+        # 🔒 Lock the room first: a message stored concurrently either
+        # commits before the count (and is counted) or bumps the counter
+        # after this update (see record_unread), never both or neither
+        locked = (
+            ChatRoom.objects
+            .select_for_update()
+            .filter(id=room.id)
+            .filter(
+                Q(**{f"{prefix}_last_read_at__isnull": True}) |
+                Q(**{f"{prefix}_last_read_at__lt": read_at}) |
+                Q(**{
+                    f"{prefix}_last_read_at": read_at,
+                    f"{prefix}_last_read_message_id__lt": message.id,
+                })
+            )
+            .exists()
+        )
+
+        if not locked:
+            return False
+
+        # Only rows still unread after the new watermark are counted
+        still_unread = ChatMessage.objects.filter(
+            chat_room_id=room.id,
+            receiver_id=user_id,
+        ).filter(
+            Q(created_at__gt=read_at) |
+            Q(created_at=read_at, id__gt=message.id)
+        ).count()
+
+        ChatRoom.objects.filter(id=room.id).update(**{
+            f"{prefix}_last_read_message_id": message.id,
+            f"{prefix}_last_read_at": read_at,
+            f"{prefix}_unread_count": still_unread,
+        })
+
+    setattr(room, f"{prefix}_last_read_message_id", message.id)
+    setattr(room, f"{prefix}_last_read_at", read_at)
+    setattr(room, f"{prefix}_unread_count", still_unread)
+
+    return True
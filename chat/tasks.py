@@ -0,0 +1,49 @@
+from celery import shared_task
+from django.core.cache import cache
+
+from . import message_buffer, presence, push
+from .events import presence_group_name, send_group_events
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 10})
+def deliver_push_notifications(self):
+    """
+    Drain due pushes from the outbox, one FCM batch at a time
+    """
+    # Pushes queued from here on schedule a fresh run
+    cache.delete(push.PUSH_DRAIN_LOCK)
+
+    total = 0
+
+    while True:
+        count = push.deliver_pending()
+        total += count
+
+        if count < push.PUSH_BATCH_SIZE:
+            break
+
+    return f"Delivered {total} push notifications"
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 10})
+def replay_chat_message_journal(self):
+    """
+    Store buffered chat messages whose process died before flushing
+    """
+    count = message_buffer.replay_journal()
+    return f"Replayed {count} chat messages"
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 10})
+def sweep_chat_presence(self):
+    """
+    Announce users whose sockets vanished without disconnecting as offline
+    """
+    offline = presence.sweep_expired_presence()
+
+    send_group_events([
+        (presence_group_name(user_id), presence.presence_event(user_id, False, last_seen))
+        for user_id, last_seen in offline.items()
+    ])
+
+    return f"{len(offline)} users went offline"
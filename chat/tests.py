@@ -1,3 +1,194 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from auth_api.models import CustomUser
+from .models import PushNotification
+from .push import (
+    PUSH_MAX_ATTEMPTS,
+    FakePushTransport,
+    PushResult,
+    deliver_pending,
+    queue_push_notification,
+    retry_delay,
+)
+
+
+class FailingPushTransport:
+    """
+    Fails every push with the given result
+    """
+
+    def __init__(self, permanent=False, error="unavailable"):
+        self.permanent = permanent
+        self.error = error
+        self.calls = 0
+
+    def send_each(self, pushes):
+        self.calls += 1
+        return [PushResult(False, error=self.error, permanent=self.permanent) for _ in pushes]
+
+
+class RaisingPushTransport:
+
+    def send_each(self, pushes):
+        raise ConnectionError("FCM unreachable")
+
+
+class PushTestCase(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="push@example.com",
+            password="x",
+            name="Push",
+            phone_number="9876543210",
+            fcm_token="token-1"
+        )
+
+    def make_due(self, push):
+        PushNotification.objects.filter(id=push.id).update(next_attempt_at=timezone.now())
+
+
+class QueuePushNotificationTests(PushTestCase):
+
+    def test_pending_push_with_same_collapse_key_is_replaced(self):
+        first = queue_push_notification(self.user, "New message", "one", collapse_key="chat_1")
+        second = queue_push_notification(self.user, "New message", "two", collapse_key="chat_1")
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(PushNotification.objects.count(), 1)
+        self.assertEqual(PushNotification.objects.get().body, "two")
+
+    def test_other_collapse_keys_are_kept_apart(self):
+        queue_push_notification(self.user, "New message", "one", collapse_key="chat_1")
+        queue_push_notification(self.user, "New message", "two", collapse_key="chat_2")
+        queue_push_notification(self.user, "Match", "three")
+
+        self.assertEqual(PushNotification.objects.count(), 3)
+
+    def test_claimed_push_is_not_replaced(self):
+        first = queue_push_notification(self.user, "New message", "one", collapse_key="chat_1")
+        PushNotification.objects.filter(id=first.id).update(status="sending", attempts=1)
+
+        second = queue_push_notification(self.user, "New message", "two", collapse_key="chat_1")
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(PushNotification.objects.get(id=first.id).body, "one")
+
+    def test_user_without_token_gets_no_push(self):
+        self.user.fcm_token = ""
+
+        self.assertIsNone(queue_push_notification(self.user, "Match", "request"))
+        self.assertFalse(PushNotification.objects.exists())
+
+
+class DeliverPendingTests(PushTestCase):
+
+    def test_delivered_push_is_sent(self):
+        push = queue_push_notification(self.user, "Match", "request", data={"room_id": 3})
+        transport = FakePushTransport()
+
+        self.assertEqual(deliver_pending(transport=transport), 1)
+
+        push.refresh_from_db()
+        self.assertEqual(push.status, "sent")
+        self.assertIsNotNone(push.sent_at)
+        self.assertEqual(transport.sent, [{
+            "token": "token-1",
+            "title": "Match",
+            "body": "request",
+            "data": {"room_id": "3"},
+        }])
+
+    def test_failed_push_is_retried_with_backoff(self):
+        push = queue_push_notification(self.user, "Match", "request")
+        transport = FailingPushTransport()
+
+        before = timezone.now()
+        deliver_pending(transport=transport)
+        push.refresh_from_db()
+
+        self.assertEqual(push.status, "pending")
+        self.assertEqual(push.attempts, 1)
+        self.assertEqual(push.last_error, "unavailable")
+        self.assertGreaterEqual(push.next_attempt_at, before + retry_delay(1))
+
+        # Not due yet
+        self.assertEqual(deliver_pending(transport=transport), 0)
+
+        self.make_due(push)
+        before = timezone.now()
+        deliver_pending(transport=transport)
+        push.refresh_from_db()
+
+        self.assertEqual(push.attempts, 2)
+        self.assertEqual(retry_delay(2), 2 * retry_delay(1))
+        self.assertGreaterEqual(push.next_attempt_at, before + retry_delay(2))
+
+    def test_transport_error_is_retried(self):
+        push = queue_push_notification(self.user, "Match", "request")
+
+        with self.assertLogs("chat.push", "ERROR"):
+            self.assertEqual(deliver_pending(transport=RaisingPushTransport()), 1)
+        push.refresh_from_db()
+
+        self.assertEqual(push.status, "pending")
+        self.assertEqual(push.attempts, 1)
+        self.assertEqual(push.last_error, "FCM unreachable")
+        self.assertGreater(push.next_attempt_at, timezone.now())
+
+    def test_permanent_failure_is_not_retried(self):
+        push = queue_push_notification(self.user, "Match", "request")
+        transport = FailingPushTransport(permanent=True, error="unregistered")
+
+        deliver_pending(transport=transport)
+        push.refresh_from_db()
+
+        self.assertEqual(push.status, "failed")
+        self.assertEqual(push.last_error, "unregistered")
+
+        self.make_due(push)
+        self.assertEqual(deliver_pending(transport=transport), 0)
+        self.assertEqual(transport.calls, 1)
+
+    def test_push_fails_after_max_attempts(self):
+        push = queue_push_notification(self.user, "Match", "request")
+        PushNotification.objects.filter(id=push.id).update(attempts=PUSH_MAX_ATTEMPTS - 1)
+
+        deliver_pending(transport=FailingPushTransport())
+        push.refresh_from_db()
+
+        self.assertEqual(push.status, "failed")
+        self.assertEqual(push.attempts, PUSH_MAX_ATTEMPTS)
+
+    def test_recipient_without_token_fails(self):
+        push = queue_push_notification(self.user, "Match", "request")
+        CustomUser.objects.filter(id=self.user.id).update(fcm_token="")
+        transport = FakePushTransport()
+
+        deliver_pending(transport=transport)
+        push.refresh_from_db()
+
+        self.assertEqual(push.status, "failed")
+        self.assertEqual(transport.sent, [])
+
+    def test_push_left_sending_is_reclaimed_after_its_lease(self):
+        push = queue_push_notification(self.user, "Match", "request")
+        PushNotification.objects.filter(id=push.id).update(
+            status="sending",
+            attempts=1,
+            next_attempt_at=timezone.now() + timedelta(minutes=1)
+        )
+        transport = FakePushTransport()
+
+        # Lease still running: another worker may be sending it
+        self.assertEqual(deliver_pending(transport=transport), 0)
+
+        self.make_due(push)
+        self.assertEqual(deliver_pending(transport=transport), 1)
+        push.refresh_from_db()
 
-# Create your tests here.
+        self.assertEqual(push.status, "sent")
+        self.assertEqual(push.attempts, 2)
@@ -1,89 +1,54 @@
-from django.db.models import Q, OuterRef, Subquery
+from django.db.models import Q
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
-from datetime import timedelta
 from chat.models import ChatRoom, ChatMessage
-from auth_api.models import SubscriptionPayment
+from auth_api.entitlements import subscription_expiries
 from .serializers import *
+from .pagination import ChatHistoryPagination
+from .presence import get_presence
 from auth_api.api_response import APIResponseMixin
 
 class ChatUserListAPIView(APIView, APIResponseMixin):
     permission_classes = [IsAuthenticated]
 
-    def get_active_subscription(self, user):
-        """
-        Check if user has an active, non-expired subscription
-        Returns True if user has purchased a plan and it hasn't expired
-        """
-        try:
-            # Get the latest successful payment
-            latest_payment = (
-                SubscriptionPayment.objects
-                .filter(user=user, payment_status="success")
-                .select_related("subscription")
-                .order_by("-paid_at")
-                .first()
-            )
-
-            if not latest_payment:
-                return False
-
-            # Check if subscription plan is active
-            if not latest_payment.subscription.is_active:
-                return False
-
-            # Check if subscription hasn't expired
-            if not latest_payment.paid_at:
-                return False
-
-            expiry_date = latest_payment.paid_at + timedelta(
-                days=latest_payment.subscription.validity
-            )
-
-            return expiry_date > timezone.now()
-
-        except Exception:
-            return False
-
     def get(self, request):
         user = request.user
 
-        # 🔹 Subquery to fetch last message per room
-        last_message_qs = ChatMessage.objects.filter(
-            chat_room=OuterRef("pk")
-        ).order_by("-created_at")
-
+        # 🔹 Last message is denormalized on the room
         chat_rooms = (
             ChatRoom.objects
             .filter(Q(user1=user) | Q(user2=user))
             .exclude(user1__is_deleted=True)
             .exclude(user2__is_deleted=True)
-            .annotate(
-                last_message_text=Subquery(
-                    last_message_qs.values("message_text")[:1]
-                ),
-                last_message_time=Subquery(
-                    last_message_qs.values("created_at")[:1]
-                )
-            )
             .select_related("user1", "user2")
             .order_by("-last_message_time", "-created_at")
         )
 
-        response_data = []
+        # 🔹 Chat partners and their subscription status, in one query
+        rooms = [
+            (room, room.user2 if room.user1_id == user.id else room.user1)
+            for room in chat_rooms
+        ]
+        partner_ids = [other_user.id for _, other_user in rooms]
+        subscriber_ids = subscription_expiries(partner_ids)
+
+        # 🟢 Online status of every partner, one Redis round trip
+        presence = get_presence(partner_ids)
 
-        for room in chat_rooms:
-            other_user = room.user2 if room.user1 == user else room.user1
+        response_data = []
 
+        for room, other_user in rooms:
             response_data.append({
                 "chat_room_id": room.id,
                 "user_id": other_user.id,
                 "unique_id": other_user.unique_id,
                 "name": other_user.name,
                 "profile_image": other_user.profile_image,
-                "is_subscribed": self.get_active_subscription(other_user),
+                "is_subscribed": other_user.id in subscriber_ids,
+                "unread_count": room.unread_count(user.id),
+                "is_online": presence[other_user.id]["is_online"],
+                "last_seen": presence[other_user.id]["last_seen"],
                 "last_message": room.last_message_text,
                 "last_message_time": room.last_message_time,
             })
@@ -106,27 +71,35 @@ class ChatHistoryAPIView(APIView, APIResponseMixin):
         chat_room = get_object_or_404(ChatRoom, id=chat_room_id)
 
         # 🔐 Ensure user is part of the chat
-        if user not in [chat_room.user1, chat_room.user2]:
+        if user.id not in (chat_room.user1_id, chat_room.user2_id):
             return self.error_response(
                 "You are not allowed to view this chat",
                 status_code=403
             )
 
-        # 🔹 Fetch chat messages
+        # 🔹 Fetch one page of chat messages
         messages = (
             ChatMessage.objects
             .filter(chat_room=chat_room)
-            .select_related("sender", "receiver")
-            .order_by("created_at")
+            .select_related("sender")
         )
 
+        paginator = ChatHistoryPagination()
+        page = paginator.paginate_queryset(messages, request)
+
         serializer = ChatMessageSerializer(
-            messages,
+            page,
             many=True,
-            context={'current_user': user}
+            context={
+                'current_user': user,
+                'read_watermarks': {
+                    chat_room.user1_id: chat_room.user1_last_read_at,
+                    chat_room.user2_id: chat_room.user2_last_read_at,
+                }
+            }
         )
 
         return self.success_response(
             message="Chat history fetched successfully",
-            data=serializer.data
-        )
\ No newline at end of file
+            data=paginator.get_paginated_data(serializer.data)
+        )
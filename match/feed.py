@@ -0,0 +1,361 @@
+"""
+Match feed helpers.
+
+The feed for a user is the set of opposite-gender profiles of the same
+religion (and caste, unless the user is open to inter-caste matches),
+minus hidden users and users they already exchanged a match request with.
+
+Deriving that set on every request is expensive, so it is materialized
+per user into MatchFeedEntry rows by the Celery jobs in match.tasks:
+
+- rebuild_match_feed   full rebuild for one user (first visit / stale)
+- sync_profile_in_feeds fan a new or re-classified profile out to the
+                        feeds of every user who should see it
+
+Hidden users and match-request partners are kept in MatchExclusion (one
+row per direction), written inline by the hide / match request views
+together with the delete of the matching feed entry, so the change is
+visible immediately. Every feed query anti-joins against it.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from auth_api.models import MatrimonyProfile
+from auth_api.pagination import KeysetPagination
+from backend.locations import LOCATION_LEVELS, location_filter
+from .models import MatchExclusion, MatchFeed, MatchFeedEntry
+
+logger = logging.getLogger(__name__)
+
+FEED_BATCH_SIZE = 1000
+
+# A built feed older than this is still served, but a rebuild is queued
+FEED_MAX_AGE = timedelta(days=1)
+
+FEED_REBUILD_LOCK_TIMEOUT = 300
+
+# Profile fields that decide which feeds a profile belongs to
+FEED_CRITERIA_FIELDS = ("gender", "religion_id", "caste_id", "willing_inter_caste")
+
+
+class MatchFeedPagination(KeysetPagination):
+    """
+    Same (created_at, id) cursor as the live feed, read from the
+    denormalized columns on MatchFeedEntry.
+    """
+    keyset_fields = ("profile_created_at", "profile_id")
+
+
+def feed_criteria(profile):
+    return tuple(getattr(profile, field) for field in FEED_CRITERIA_FIELDS)
+
+
+def candidate_profiles(profile):
+    """
+    Live candidate set for `profile` (no request filters applied)
+    """
+    user = profile.user
+
+    # 🔹 Base gender filter
+    if profile.gender == 'male':
+        matches = MatrimonyProfile.objects.filter(gender='female')
+    elif profile.gender == 'female':
+        matches = MatrimonyProfile.objects.filter(gender='male')
+    else:
+        matches = MatrimonyProfile.objects.all()
+
+    # 🔹 Exclude self and soft-deleted users
+    matches = matches.exclude(user=user).exclude(user__is_deleted=True)
+
+    # 🔹 Religion / caste filtering
+    if profile.religion_id:
+        if profile.willing_inter_caste or not profile.caste_id:
+            matches = matches.filter(religion_id=profile.religion_id)
+        else:
+            matches = matches.filter(
+                religion_id=profile.religion_id,
+                caste_id=profile.caste_id
+            )
+
+    # 🔹 Exclude hidden users and users with existing match requests
+    excluded = MatchExclusion.objects.filter(
+        user=user,
+        excluded_user=OuterRef("user_id")
+    )
+
+    return matches.exclude(Exists(excluded))
+
+
+def interested_owners(profile):
+    """
+    Profiles of users with a built feed whose candidate set includes `profile`.
+
+    This is candidate_profiles() read in the other direction.
+    """
+    visible_to = ~Q(gender__in=["male", "female"])
+    if profile.gender == "female":
+        visible_to |= Q(gender="male")
+    elif profile.gender == "male":
+        visible_to |= Q(gender="female")
+
+    religion_ok = Q(religion__isnull=True) | (
+        Q(religion_id=profile.religion_id) & (
+            Q(willing_inter_caste=True) |
+            Q(caste__isnull=True) |
+            Q(caste_id=profile.caste_id)
+        )
+    )
+
+    excluded = MatchExclusion.objects.filter(
+        user=OuterRef("user_id"),
+        excluded_user_id=profile.user_id
+    )
+
+    return (
+        MatrimonyProfile.objects
+        .filter(visible_to, religion_ok)
+        .filter(user__match_feed__built_at__isnull=False)
+        .exclude(user_id=profile.user_id)
+        .exclude(user__is_deleted=True)
+        .exclude(Exists(excluded))
+    )
+
+
+def apply_feed_filters(queryset, params, my_profile, prefix=""):
+    """
+    Apply the optional query-string filters of the match feed.
+
+    `prefix` is the path from the queryset's model to MatrimonyProfile
+    ("" for profiles, "profile__" for feed entries).
+    """
+    def field(name):
+        return f"{prefix}{name}"
+
+    # 🔹 Apply caste filter only if user is open to inter-caste marriages
+    if my_profile.willing_inter_caste:
+        caste = params.get('caste')
+        if caste:
+            queryset = queryset.filter(**{field("caste__id"): caste})
+
+    # 🔹 Exact-match filters
+    for name in (
+        "education",
+        "annual_income",
+        "job_type",
+        "family_status",
+        "marital_status",
+    ):
+        value = params.get(name)
+        if value:
+            queryset = queryset.filter(**{field(name): value})
+
+    # 🔹 Location filters (Location id or free text)
+    for name in LOCATION_LEVELS:
+        value = params.get(name)
+        if value:
+            queryset = queryset.filter(location_filter(name, value, prefix))
+
+    # 🔹 Lifestyle filters
+    for name in ("smoking", "drinking", "eating_habits"):
+        value = params.get(name)
+        if value:
+            queryset = queryset.filter(**{field(f"lifestyle__{name}"): value})
+
+    return queryset
+
+
+def materialized_feed(user):
+    # The anti-join is an index probe per scanned row; it covers entries
+    # written by a rebuild that raced with a hide / match request.
+    excluded = MatchExclusion.objects.filter(
+        user=user,
+        excluded_user=OuterRef("candidate_id")
+    )
+
+    return (
+        MatchFeedEntry.objects
+        .filter(owner=user, candidate__is_deleted=False)
+        .exclude(Exists(excluded))
+        .select_related("profile__user", "profile__religion", "profile__caste")
+    )
+
+
+def feed_is_ready(user):
+    """
+    True when the user's feed has been built. Queues a rebuild when the
+    feed is missing or older than FEED_MAX_AGE.
+    """
+    built_at = (
+        MatchFeed.objects
+        .filter(user=user)
+        .values_list("built_at", flat=True)
+        .first()
+    )
+
+    if not built_at or built_at < timezone.now() - FEED_MAX_AGE:
+        schedule_feed_rebuild(user.id)
+
+    return built_at is not None
+
+
+def schedule_feed_rebuild(user_id):
+    from .tasks import rebuild_match_feed
+
+    # 🔒 One queued rebuild per user at a time
+    if not cache.add(f"match_feed_rebuild_{user_id}", True, FEED_REBUILD_LOCK_TIMEOUT):
+        return
+
+    _delay(rebuild_match_feed, user_id)
+
+
+def schedule_profile_sync(profile_id, rebuild_own_feed=False):
+    from .tasks import sync_profile_in_feeds
+
+    _delay(sync_profile_in_feeds, profile_id, rebuild_own_feed)
+
+
+def exclude_from_feed(user_id, excluded_user_id, reason):
+    """
+    Record that `excluded_user_id` must not appear in `user_id`'s feed and
+    drop them from the materialized feed. Idempotent.
+    """
+    MatchExclusion.objects.bulk_create(
+        [MatchExclusion(
+            user_id=user_id,
+            excluded_user_id=excluded_user_id,
+            reason=reason
+        )],
+        ignore_conflicts=True
+    )
+
+    MatchFeedEntry.objects.filter(
+        owner_id=user_id,
+        candidate_id=excluded_user_id
+    ).delete()
+
+
+def exclude_match_pair(user_id, other_user_id):
+    """
+    A match request hides both users from each other's feed
+    """
+    exclude_from_feed(user_id, other_user_id, "match_request")
+    exclude_from_feed(other_user_id, user_id, "match_request")
+
+
+def _delay(task, *args):
+    # The feed is an optimisation; never fail the request if the broker is down
+    def send():
+        try:
+            task.delay(*args)
+        except Exception:
+            logger.exception("Could not queue %s%s", task.name, args)
+
+    transaction.on_commit(send)
+
+
+def _bulk_insert(entries):
+    MatchFeedEntry.objects.bulk_create(
+        entries,
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def rebuild_feed(user_id):
+    profile = (
+        MatrimonyProfile.objects
+        .select_related("user")
+        .filter(user_id=user_id)
+        .first()
+    )
+
+    if not profile or profile.user.is_deleted:
+        MatchFeed.objects.filter(user_id=user_id).delete()
+        MatchFeedEntry.objects.filter(owner_id=user_id).delete()
+        return 0
+
+    rows = (
+        candidate_profiles(profile)
+        .values_list("id", "user_id", "created_at")
+        .iterator(chunk_size=FEED_BATCH_SIZE)
+    )
+
+    count = 0
+    with transaction.atomic():
+        MatchFeedEntry.objects.filter(owner_id=user_id).delete()
+
+        batch = []
+        for profile_id, candidate_id, created_at in rows:
+            batch.append(MatchFeedEntry(
+                owner_id=user_id,
+                profile_id=profile_id,
+                candidate_id=candidate_id,
+                profile_created_at=created_at,
+            ))
+            if len(batch) >= FEED_BATCH_SIZE:
+                _bulk_insert(batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            _bulk_insert(batch)
+            count += len(batch)
+
+        MatchFeed.objects.update_or_create(
+            user_id=user_id,
+            defaults={"built_at": timezone.now()}
+        )
+
+    return count
+
+
+def sync_profile(profile_id):
+    """
+    Re-place one profile in every built feed it belongs to.
+    """
+    profile = (
+        MatrimonyProfile.objects
+        .select_related("user")
+        .filter(id=profile_id)
+        .first()
+    )
+
+    if not profile:
+        return 0
+
+    owner_ids = (
+        interested_owners(profile)
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=FEED_BATCH_SIZE)
+    )
+
+    count = 0
+    with transaction.atomic():
+        MatchFeedEntry.objects.filter(profile_id=profile.id).delete()
+
+        if profile.user.is_deleted:
+            return 0
+
+        batch = []
+        for owner_id in owner_ids:
+            batch.append(MatchFeedEntry(
+                owner_id=owner_id,
+                profile_id=profile.id,
+                candidate_id=profile.user_id,
+                profile_created_at=profile.created_at,
+            ))
+            if len(batch) >= FEED_BATCH_SIZE:
+                _bulk_insert(batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            _bulk_insert(batch)
+            count += len(batch)
+
+    return count
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_exclusions(apps, schema_editor):
+    HiddenMatch = apps.get_model('match', 'HiddenMatch')
+    MatchRequest = apps.get_model('match', 'MatchRequest')
+    MatchExclusion = apps.get_model('match', 'MatchExclusion')
+
+    batch = []
+
+    def flush():
+        MatchExclusion.objects.bulk_create(batch, ignore_conflicts=True)
+        batch.clear()
+
+    for user_id, hidden_user_id in HiddenMatch.objects.values_list(
+        'user_id', 'hidden_user_id'
+    ).iterator(chunk_size=2000):
+        batch.append(MatchExclusion(
+            user_id=user_id, excluded_user_id=hidden_user_id, reason='hidden'
+        ))
+        if len(batch) >= 2000:
+            flush()
+
+    for from_id, to_id in MatchRequest.objects.values_list(
+        'from_user_id', 'to_user_id'
+    ).iterator(chunk_size=1000):
+        batch.append(MatchExclusion(
+            user_id=from_id, excluded_user_id=to_id, reason='match_request'
+        ))
+        batch.append(MatchExclusion(
+            user_id=to_id, excluded_user_id=from_id, reason='match_request'
+        ))
+        if len(batch) >= 2000:
+            flush()
+
+    flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0010_matchfeed_matchfeedentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchExclusion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('hidden', 'Hidden'), ('match_request', 'Match Request')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('excluded_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_exclusions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'excluded_user')},
+            },
+        ),
+        migrations.RunPython(backfill_exclusions, migrations.RunPython.noop),
+    ]
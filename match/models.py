@@ -1,5 +1,5 @@
 from django.db import models
-from auth_api.models import CustomUser
+from auth_api.models import CustomUser, MatrimonyProfile
 # Create your models here.
 
 
@@ -30,6 +30,41 @@ class HiddenMatch(models.Model):
     def __str__(self):
         return f"{self.user.email} hid {self.hidden_user.email}"
 
+class MatchExclusion(models.Model):
+    """
+    Users that must never appear in `user`'s match feed: users they hid
+    and users they exchanged a match request with (stored in both
+    directions). The feed anti-joins against this table instead of
+    re-deriving the set from HiddenMatch and MatchRequest.
+    """
+    REASON_CHOICES = (
+        ('hidden', 'Hidden'),
+        ('match_request', 'Match Request'),
+    )
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='match_exclusions'
+    )
+
+    excluded_user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'excluded_user')
+
+    def __str__(self):
+        return f"{self.user_id} excludes {self.excluded_user_id} ({self.reason})"
+
+
 class MatchRequest(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -187,4 +222,65 @@ class Notification(models.Model):
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"{self.recipient.email} - {self.notification_type}"
\ No newline at end of file
+        return f"{self.recipient.email} - {self.notification_type}"
+
+
+class MatchFeed(models.Model):
+    """
+    Marks a user's materialized match feed as built (see match.feed)
+    """
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="match_feed"
+    )
+
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Match feed - {self.user.email}"
+
+
+class MatchFeedEntry(models.Model):
+    """
+    One precomputed candidate in a user's match feed.
+
+    Rows are written by the match.tasks Celery jobs; profile_created_at is
+    copied from the profile so a feed page is a range scan on the
+    (owner, profile_created_at, profile) index.
+    """
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="match_feed_entries"
+    )
+
+    profile = models.ForeignKey(
+        MatrimonyProfile,
+        on_delete=models.CASCADE,
+        related_name="feed_entries"
+    )
+
+    candidate = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+
+    profile_created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("owner", "profile")
+        indexes = [
+            models.Index(
+                fields=["owner", "-profile_created_at", "-profile"],
+                name="match_feed_owner_seek_idx"
+            ),
+            models.Index(
+                fields=["owner", "candidate"],
+                name="match_feed_owner_cand_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} → profile {self.profile_id}"
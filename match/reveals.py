@@ -0,0 +1,76 @@
+"""
+Contact reveal quota.
+
+A subscriber may reveal the contact details of up to their plan's
+reveal_limit distinct users; looking at someone already revealed is
+free. The quota lives in CustomUser.profile_reveal_count and the reveals
+in ContactInfoView (one row per viewer / viewed user).
+
+reveal_contact() claims the reveal in a single statement: the
+ContactInfoView upsert tells a first reveal from a revisit, and only a
+first reveal bumps the counter, with a conditional UPDATE that can't go
+past the limit however many requests race. Nothing is locked up front.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from auth_api.models import CustomUser
+from .models import ContactInfoView
+
+REVEAL_SQL = """
+WITH contact_view AS (
+    INSERT INTO {views} AS v
+        (viewer_id, viewed_user_id, views_count, last_viewed_at, created_at)
+    VALUES (%(viewer)s, %(viewed)s, 1, %(now)s, %(now)s)
+    ON CONFLICT (viewer_id, viewed_user_id) DO UPDATE
+        SET views_count = v.views_count + 1,
+            last_viewed_at = EXCLUDED.last_viewed_at
+    RETURNING (xmax = 0) AS is_new
+),
+quota AS (
+    UPDATE {users}
+    SET profile_reveal_count = profile_reveal_count + 1
+    WHERE id = %(viewer)s
+      AND profile_reveal_count < %(limit)s
+      AND EXISTS (SELECT 1 FROM contact_view WHERE is_new)
+    RETURNING profile_reveal_count
+)
+SELECT contact_view.is_new, quota.profile_reveal_count, u.profile_reveal_count
+FROM contact_view
+CROSS JOIN {users} u
+LEFT JOIN quota ON TRUE
+WHERE u.id = %(viewer)s
+"""
+
+
+def reveal_contact(viewer_id, viewed_user_id, reveal_limit):
+    """
+    Record a contact reveal against the viewer's quota.
+
+    Returns (allowed, is_first_view, current_count). A first reveal over
+    the limit is not recorded.
+    """
+    sql = REVEAL_SQL.format(
+        views=ContactInfoView._meta.db_table,
+        users=CustomUser._meta.db_table,
+    )
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                "viewer": viewer_id,
+                "viewed": viewed_user_id,
+                "limit": reveal_limit,
+                "now": timezone.now(),
+            })
+            is_new, new_count, old_count = cursor.fetchone()
+
+        if is_new and new_count is None:
+            # 🔒 Over the limit: drop the ContactInfoView row just inserted
+            transaction.set_rollback(True)
+            return False, False, old_count
+
+    if is_new:
+        return True, True, new_count
+
+    return True, False, old_count
@@ -0,0 +1,91 @@
+"""
+Profile search.
+
+Identifier-shaped queries take an exact / prefix fast path:
+
+- unique id ("USR-ABC-1...")  prefix match on the unique index
+- phone number                exact match on the +91 normalized number
+
+Everything else is a substring match on name / email / phone backed by
+pg_trgm GIN indexes on CustomUser, ranked by trigram similarity and
+capped at SEARCH_MAX_RESULTS.
+"""
+import re
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from rest_framework.pagination import PageNumberPagination
+
+from auth_api.models import MatrimonyProfile
+from auth_api.serializers import format_phone_number
+
+SEARCH_MAX_RESULTS = 200
+
+# pg_trgm can't use the index for patterns shorter than a trigram
+SEARCH_MIN_LENGTH = 3
+
+UNIQUE_ID_PREFIX = "USR-"
+
+# "USR-ABC-12345-001", with or without the USR- prefix
+UNIQUE_ID_RE = re.compile(r"^(USR-)?[A-Z]{3}(-[0-9]{0,5}(-[0-9]*)?)?$")
+
+
+class ProfileSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 50
+
+
+def _profiles():
+    return (
+        MatrimonyProfile.objects
+        .select_related("user", "religion", "caste")
+        .exclude(user__is_deleted=True)
+    )
+
+
+def search_profiles(query):
+    """
+    Ranked profiles matching `query`, at most SEARCH_MAX_RESULTS of them
+    """
+    query = " ".join(query.split())
+
+    # 🔹 Unique id fast path
+    unique_id = query.upper()
+    if UNIQUE_ID_RE.match(unique_id) and "-" in unique_id:
+        if not unique_id.startswith(UNIQUE_ID_PREFIX):
+            unique_id = UNIQUE_ID_PREFIX + unique_id
+
+        return (
+            _profiles()
+            .filter(user__unique_id__startswith=unique_id)
+            .order_by("user__unique_id")[:SEARCH_MAX_RESULTS]
+        )
+
+    # 🔹 Phone number fast path
+    phone = format_phone_number(re.sub(r"[()]", "", query))
+    if phone:
+        return (
+            _profiles()
+            .filter(user__phone_number=phone)
+            .order_by("-created_at")[:SEARCH_MAX_RESULTS]
+        )
+
+    if len(query) < SEARCH_MIN_LENGTH:
+        return MatrimonyProfile.objects.none()
+
+    # 🔹 Substring match (trigram indexed), best match first
+    return (
+        _profiles()
+        .filter(
+            Q(user__name__icontains=query) |
+            Q(user__email__icontains=query) |
+            Q(user__phone_number__icontains=query)
+        )
+        .annotate(rank=Greatest(
+            TrigramSimilarity("user__name", query),
+            TrigramSimilarity("user__email", query),
+        ))
+        .order_by("-rank", "-created_at")[:SEARCH_MAX_RESULTS]
+    )
@@ -4,6 +4,7 @@ from datetime import date
 from auth_api.models import MatrimonyProfile,PersonalLifestyle,UserImage
 from backend.models import Caste, Event
 from auth_api.models import CustomUser
+from auth_api.images import ImageVariantField
 from .models import *
 from sindhuura.datetime_utils import to_ist
 from django.utils import timezone
@@ -17,7 +18,7 @@ class CasteSerializer(serializers.ModelSerializer):
 
 class MatchProfileSerializer(serializers.ModelSerializer):
     name = serializers.CharField(source="user.name")
-    profile_image = serializers.ImageField(source="user.profile_image")
+    profile_image = ImageVariantField("thumb", source="user.profile_image")
     age = serializers.SerializerMethodField()
     user_id = serializers.IntegerField(source="user.id", read_only=True)
     is_verified = serializers.BooleanField(source="user.is_verified", read_only=True)
@@ -126,9 +127,12 @@ class ReceivedMatchRequestSerializer(serializers.ModelSerializer):
 
 
 class UserImageSerializer(serializers.ModelSerializer):
+    image = ImageVariantField("large")
+    thumbnail = ImageVariantField("thumb", source="image")
+
     class Meta:
         model = UserImage
-        fields = ["id", "image", "uploaded_at"]
+        fields = ["id", "image", "thumbnail", "uploaded_at"]
 
 
 class PersonalLifestyleSerializer(serializers.ModelSerializer):
@@ -170,9 +174,12 @@ class UserDetailSerializer(serializers.ModelSerializer):
         ]
 
 class PaidUserImageSerializer(serializers.ModelSerializer):
+    image = ImageVariantField("large")
+    thumbnail = ImageVariantField("thumb", source="image")
+
     class Meta:
         model = UserImage
-        fields = ["id", "image", "uploaded_at"]
+        fields = ["id", "image", "thumbnail", "uploaded_at"]
 
 
 class PaidHoroscopeSerializer(serializers.ModelSerializer):
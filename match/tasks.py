@@ -0,0 +1,39 @@
+from celery import shared_task
+from django.core.cache import cache
+
+from . import feed
+from .models import MatchFeed
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 10})
+def rebuild_match_feed(self, user_id):
+    """
+    Rebuild the materialized match feed of one user
+    """
+    try:
+        count = feed.rebuild_feed(user_id)
+    finally:
+        cache.delete(f"match_feed_rebuild_{user_id}")
+
+    return f"Match feed for user {user_id} rebuilt with {count} candidates"
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 10})
+def sync_profile_in_feeds(self, profile_id, rebuild_own_feed=False):
+    """
+    Add a new (or re-classified) profile to every built feed it belongs to
+    """
+    count = feed.sync_profile(profile_id)
+
+    if rebuild_own_feed:
+        # Only users who already have a built feed need it redone
+        user_id = (
+            MatchFeed.objects
+            .filter(user__profile__id=profile_id)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+        if user_id:
+            feed.schedule_feed_rebuild(user_id)
+
+    return f"Profile {profile_id} placed in {count} feeds"
@@ -11,9 +11,22 @@ from rest_framework import status as drf_status
 from chat.models import ChatRoom
 from datetime import timedelta
 from auth_api.models import CustomUser
-from auth_api.models import SubscriptionPayment
-from chat.firebase import send_push_notification
-from django.utils import timezone
+from auth_api.entitlements import get_entitlement
+from chat.events import notify_match_request, notify_notification, notify_room_created
+from chat.push import queue_push_notification
+from django.db import transaction
+from auth_api.pagination import KeysetPagination
+from .feed import (
+    MatchFeedPagination,
+    apply_feed_filters,
+    candidate_profiles,
+    feed_is_ready,
+    exclude_from_feed,
+    exclude_match_pair,
+    materialized_feed,
+)
+from .reveals import reveal_contact
+from .search import ProfileSearchPagination, search_profiles
 
 
 class HideMatchAPIView(APIResponseMixin, APIView):
@@ -50,10 +63,12 @@ class HideMatchAPIView(APIResponseMixin, APIView):
                 )
             
             # Create or get hidden match record
-            hidden_match, created = HiddenMatch.objects.get_or_create(
-                user=user,
-                hidden_user=hidden_user
-            )
+            with transaction.atomic():
+                hidden_match, created = HiddenMatch.objects.get_or_create(
+                    user=user,
+                    hidden_user=hidden_user
+                )
+                exclude_from_feed(user.id, hidden_user.id, "hidden")
             
             if created:
                 return self.success_response(
@@ -90,115 +105,41 @@ class MatchProfileListAPIView(APIResponseMixin, APIView):
                     status_code=status.HTTP_404_NOT_FOUND
                 )
 
-            # 🔹 Base gender filter
-            if my_profile.gender == 'male':
-                matches = MatrimonyProfile.objects.filter(gender='female')
-            elif my_profile.gender == 'female':
-                matches = MatrimonyProfile.objects.filter(gender='male')
+            if feed_is_ready(user):
+                # 🔹 Precomputed feed: one range read on MatchFeedEntry
+                entries = apply_feed_filters(
+                    materialized_feed(user),
+                    request.query_params,
+                    my_profile,
+                    prefix="profile__"
+                )
+
+                paginator = MatchFeedPagination()
+                page = [
+                    entry.profile
+                    for entry in paginator.paginate_queryset(entries, request)
+                ]
             else:
-                matches = MatrimonyProfile.objects.all()
+                # 🔹 Feed is being built in the background – query live
+                matches = apply_feed_filters(
+                    candidate_profiles(my_profile),
+                    request.query_params,
+                    my_profile
+                ).select_related("user", "religion", "caste")
 
-            # 🔹 Exclude self
-            matches = matches.exclude(user=user)
-            
-            # 🔹 Exclude soft-deleted users
-            matches = matches.exclude(user__is_deleted=True)
-
-            # 🔹 EXCLUDE HIDDEN USERS - NEW CODE
-            hidden_user_ids = HiddenMatch.objects.filter(
-                user=user
-            ).values_list('hidden_user_id', flat=True)
-            matches = matches.exclude(user__id__in=hidden_user_ids)
-
-            # 🔹 Religion / caste filtering
-            if my_profile.religion:
-                if my_profile.willing_inter_caste:
-                    matches = matches.filter(religion=my_profile.religion)
-                else:
-                    if my_profile.caste:
-                        matches = matches.filter(
-                            religion=my_profile.religion,
-                            caste=my_profile.caste
-                        )
-                    else:
-                        matches = matches.filter(religion=my_profile.religion)
-
-            # 🔹 EXCLUDE USERS WITH EXISTING MATCH REQUESTS
-            requested_user_ids = MatchRequest.objects.filter(
-                Q(from_user=user) | Q(to_user=user)
-            ).values_list("from_user_id", "to_user_id")
-
-            # Flatten IDs
-            exclude_user_ids = set()
-            for from_id, to_id in requested_user_ids:
-                exclude_user_ids.add(from_id)
-                exclude_user_ids.add(to_id)
-
-            matches = matches.exclude(user__id__in=exclude_user_ids)
-
-            # 🔹 Apply caste filter only if user is open to inter-caste marriages
-            if my_profile.willing_inter_caste:
-                caste = request.query_params.get('caste')
-                if caste:
-                    matches = matches.filter(caste__id=caste)
-
-            # 🔹 Apply common filters
-            education = request.query_params.get('education')
-            if education:
-                matches = matches.filter(education=education)
-
-            annual_income = request.query_params.get('annual_income')
-            if annual_income:
-                matches = matches.filter(annual_income=annual_income)
-
-            job_type = request.query_params.get('job_type')
-            if job_type:
-                matches = matches.filter(job_type=job_type)
-
-            country = request.query_params.get('country')
-            if country:
-                matches = matches.filter(country__icontains=country)
-
-            state = request.query_params.get('state')
-            if state:
-                matches = matches.filter(state__icontains=state)
-
-            city = request.query_params.get('city')
-            if city:
-                matches = matches.filter(city__icontains=city)
-
-            family_status = request.query_params.get('family_status')
-            if family_status:
-                matches = matches.filter(family_status=family_status)
-
-            marital_status = request.query_params.get('marital_status')
-            if marital_status:
-                matches = matches.filter(marital_status=marital_status)
-
-            # 🔹 Apply lifestyle filters
-            smoking = request.query_params.get('smoking')
-            if smoking:
-                matches = matches.filter(lifestyle__smoking=smoking)
-
-            drinking = request.query_params.get('drinking')
-            if drinking:
-                matches = matches.filter(lifestyle__drinking=drinking)
-
-            eating_habits = request.query_params.get('eating_habits')
-            if eating_habits:
-                matches = matches.filter(lifestyle__eating_habits=eating_habits)
-
-            matches = matches.order_by("-created_at")
+                # 🔹 Keyset pagination on (created_at, id) – no OFFSET, no COUNT
+                paginator = KeysetPagination()
+                page = paginator.paginate_queryset(matches, request)
 
             serializer = MatchProfileSerializer(
-                matches,
+                page,
                 many=True,
                 context={"request": request}
             )
 
             return self.success_response(
                 message="Matching profiles fetched successfully",
-                data=serializer.data,
+                data=paginator.get_paginated_data(serializer.data),
                 status_code=status.HTTP_200_OK
             )
 
@@ -219,7 +160,7 @@ class MatrimonyProfileSearchAPIView(APIResponseMixin, APIView):
     """
 
     def get(self, request):
-        search_query = request.query_params.get("q")
+        search_query = request.query_params.get("q", "").strip()
 
         if not search_query:
             return self.error_response(
@@ -227,29 +168,25 @@ class MatrimonyProfileSearchAPIView(APIResponseMixin, APIView):
                 status_code=drf_status.HTTP_400_BAD_REQUEST
             )
 
-        profiles = (
-            MatrimonyProfile.objects
-            .select_related("user", "religion", "caste")
-            .filter(
-                Q(user__email__icontains=search_query) |
-                Q(user__phone_number__icontains=search_query) |
-                Q(user__name__icontains=search_query) |
-                Q(user__unique_id__icontains=search_query)
-            )
-            .exclude(user__is_deleted=True)
-        )
+        profiles = search_profiles(search_query)
 
-        if not profiles.exists():
-            return self.success_response(
-                message="No matching profiles found",
-                data=[]
-            )
+        paginator = ProfileSearchPagination()
+        page = paginator.paginate_queryset(profiles, request)
+        count = paginator.page.paginator.count
 
-        serializer = MatchProfileSerializer(profiles, many=True)
+        serializer = MatchProfileSerializer(page, many=True)
 
         return self.success_response(
-            message="Profiles fetched successfully",
-            data=serializer.data
+            message=(
+                "Profiles fetched successfully" if count
+                else "No matching profiles found"
+            ),
+            data={
+                "count": count,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": serializer.data
+            }
         )
 
 
@@ -290,11 +227,16 @@ class SendMatchRequestAPIView(APIResponseMixin, APIView):
             )
 
         # ✅ Create match request
-        match_request = MatchRequest.objects.create(
-            from_user=from_user,
-            to_user=to_user
-        )
-        Notification.objects.create(
+        with transaction.atomic():
+            match_request = MatchRequest.objects.create(
+                from_user=from_user,
+                to_user=to_user
+            )
+
+            # 🔹 Hide each user from the other's match feed
+            exclude_match_pair(from_user.id, to_user.id)
+
+        notification = Notification.objects.create(
             recipient=to_user,
             sender=from_user,
             notification_type="match_request",
@@ -303,12 +245,16 @@ class SendMatchRequestAPIView(APIResponseMixin, APIView):
             match_request=match_request
         )
 
+        # 🔹 Live update for open sockets
+        notify_notification(notification)
+        notify_match_request(match_request)
+
         # Debug: Print notification details
         print(f"Debug: Match request created. Sending notification to {to_user.email}, token: {to_user.fcm_token}")
 
-        # Send FCM notification to the recipient
-        send_push_notification(
-            to_user.fcm_token,
+        # Queue FCM notification to the recipient
+        queue_push_notification(
+            to_user,
             "New Match Request",
             f"You have received a match request from {from_user.name or from_user.email}"
         )
@@ -461,73 +407,38 @@ class RevealUserFullDetailAPIView(APIView, APIResponseMixin):
         # ✅ SUBSCRIPTION VALIDATION
         # =====================================================
 
+        entitlement = get_entitlement(viewer.id)
+
         # 1️⃣ Not subscribed → clean message, no data
-        if not viewer.is_subscribed:
+        if not entitlement:
             return self.error_response(
                 "Upgrade your plan to view contact details.",
                 status_code=status.HTTP_403_FORBIDDEN
             )
 
-        # 2️⃣ Subscription expired → mark and block
-        if viewer.subscription_expires_at and viewer.subscription_expires_at < timezone.now():
-            viewer.is_subscribed = False
-            viewer.save(update_fields=["is_subscribed"])
+        # 2️⃣ Subscription expired → block
+        if not entitlement.is_active:
             return self.error_response(
                 "Your subscription has expired. Please upgrade your plan.",
                 status_code=status.HTTP_403_FORBIDDEN
             )
 
+        reveal_limit = entitlement.reveal_limit
+
         # =====================================================
-        # ✅ GET ACTIVE PLAN FOR REVEAL LIMIT
+        # ✅ CLAIM THE REVEAL (re-visit = free), one statement
         # =====================================================
 
-        payment = SubscriptionPayment.objects.filter(
-            user=viewer,
-            payment_status="success"
-        ).select_related("subscription").order_by("-created_at").first()
+        allowed, is_first_view, current_count = reveal_contact(
+            viewer.id, viewed_user.id, reveal_limit
+        )
 
-        if not payment or not payment.subscription:
+        if not allowed:
             return self.error_response(
-                "No active subscription plan found. Please upgrade your plan.",
+                f"You've reached your reveal limit of {reveal_limit} profiles. Upgrade your plan for more.",
                 status_code=status.HTTP_403_FORBIDDEN
             )
 
-        reveal_limit = payment.subscription.reveal_limit
-
-        # =====================================================
-        # ✅ CHECK IF ALREADY REVEALED (re-visit = free)
-        # =====================================================
-
-        contact_view = ContactInfoView.objects.filter(
-            viewer=viewer,
-            viewed_user=viewed_user
-        ).first()
-
-        is_first_view = False
-
-        if not contact_view:
-            # New profile — check limit before allowing
-            if viewer.profile_reveal_count >= reveal_limit:
-                return self.error_response(
-                    f"You've reached your reveal limit of {reveal_limit} profiles. Upgrade your plan for more.",
-                    status_code=status.HTTP_403_FORBIDDEN
-                )
-
-            # ✅ First time reveal — record it and increment count
-            contact_view = ContactInfoView.objects.create(
-                viewer=viewer,
-                viewed_user=viewed_user,
-                views_count=1
-            )
-            viewer.profile_reveal_count += 1
-            viewer.save(update_fields=["profile_reveal_count"])
-            is_first_view = True
-
-        else:
-            # ✅ Already revealed before — just track visit, no count change
-            contact_view.views_count += 1
-            contact_view.save(update_fields=["views_count"])
-
         # =====================================================
         # ✅ RETURN FULL CONTACT DETAILS
         # =====================================================
@@ -538,7 +449,7 @@ class RevealUserFullDetailAPIView(APIView, APIResponseMixin):
             message="Contact details revealed successfully.",
             data={
                 **serializer.data,
-                "current_count": viewer.profile_reveal_count,
+                "current_count": current_count,
                 "limit": reveal_limit,
                 "is_first_view": is_first_view,
             },
@@ -564,10 +475,13 @@ class AcceptMatchRequestAPIView(APIView, APIResponseMixin):
             )
 
         # ✅ Accept match request
-        match_request.status = "accepted"
-        match_request.save(update_fields=["status", "updated_at"])
+        with transaction.atomic():
+            match_request.status = "accepted"
+            match_request.save(update_fields=["status", "updated_at"])
+            exclude_match_pair(match_request.from_user_id, match_request.to_user_id)
+
         # ✅ Store notification in DB
-        Notification.objects.create(
+        notification = Notification.objects.create(
             recipient=match_request.from_user,
             sender=match_request.to_user,
             notification_type="match_accepted",
@@ -575,12 +489,15 @@ class AcceptMatchRequestAPIView(APIView, APIResponseMixin):
             message=f"Your match request to {match_request.to_user.name or match_request.to_user.email} has been accepted",
             match_request=match_request
         )
+        notify_notification(notification)
+        notify_match_request(match_request)
+
         # Debug: Print notification details
         print(f"Debug: Match request accepted. Sending notification to {match_request.from_user.email}, token: {match_request.from_user.fcm_token}")
 
-        # Send FCM notification to the sender
-        send_push_notification(
-            match_request.from_user.fcm_token,
+        # Queue FCM notification to the sender
+        queue_push_notification(
+            match_request.from_user,
             "Match Request Accepted",
             f"Your match request to {match_request.to_user.name or match_request.to_user.email} has been accepted"
         )
@@ -600,6 +517,9 @@ class AcceptMatchRequestAPIView(APIView, APIResponseMixin):
             }
         )
 
+        if created:
+            notify_room_created(chat_room)
+
         return self.success_response(
             message="Match request accepted and chat room created",
             data={
@@ -634,8 +554,12 @@ class RejectMatchRequestAPIView(APIView, APIResponseMixin):
                 status_code=drf_status.HTTP_400_BAD_REQUEST
             )
 
-        match_request.status = "rejected"
-        match_request.save(update_fields=["status", "updated_at"])
+        with transaction.atomic():
+            match_request.status = "rejected"
+            match_request.save(update_fields=["status", "updated_at"])
+            exclude_match_pair(match_request.from_user_id, match_request.to_user_id)
+
+        notify_match_request(match_request)
 
         return self.success_response(
             message="Match request rejected successfully",
@@ -26,6 +26,13 @@ SECRET_KEY = 'django-insecure-s#&uh%r2vf%h!=elrnjbs409yye*6xymf3wcue=*f8#u@8rnwq
 DEBUG = True
 
 ALLOWED_HOSTS = ['*']
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/3",
+    }
+}
+
 CELERY_BROKER_URL = "redis://127.0.0.1:6379/1"
 CELERY_RESULT_BACKEND = "redis://127.0.0.1:6379/2"
 
@@ -40,12 +47,50 @@ CELERY_ENABLE_UTC = True
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
+    'expire-subscriptions': {
+        'task': 'auth_api.tasks.expire_subscriptions',
+        'schedule': crontab(minute=5),  # Hourly
+    },
     'hard-delete-soft-deleted-users': {
         'task': 'auth_api.tasks.hard_delete_soft_deleted_users',
         'schedule': crontab(hour=2, minute=0),  # Run daily at 2:00 AM IST
     },
+    'deliver-push-notifications': {
+        'task': 'chat.tasks.deliver_push_notifications',
+        'schedule': 60.0,  # Picks up retries whose backoff has elapsed
+    },
+    'replay-chat-message-journal': {
+        'task': 'chat.tasks.replay_chat_message_journal',
+        'schedule': 300.0,
+    },
+    'purge-deleted-media': {
+        'task': 'auth_api.tasks.purge_deleted_media',
+        'schedule': 900.0,  # Backstop; deletes schedule their own run
+    },
+    'sweep-chat-presence': {
+        'task': 'chat.tasks.sweep_chat_presence',
+        'schedule': 30.0,  # Offline events for sockets that died silently
+    },
 }
 
+# Buffered chat message writes (see chat/message_buffer.py)
+CHAT_MESSAGE_BUFFERING = False
+CHAT_MESSAGE_FLUSH_INTERVAL = 0.2  # seconds
+CHAT_MESSAGE_FLUSH_SIZE = 200
+CHAT_MESSAGE_DURABLE = True  # journal to Redis before fan-out
+CHAT_MESSAGE_JOURNAL_URL = "redis://127.0.0.1:6379/4"
+
+# Chat presence and typing indicators (see chat/presence.py)
+CHAT_PRESENCE_URL = "redis://127.0.0.1:6379/5"
+CHAT_PRESENCE_TTL = 60  # seconds; clients send a heartbeat well within this
+CHAT_TYPING_THROTTLE = 3  # seconds between "typing" events per socket
+
+# Websocket auth (see chat/middleware.py)
+CHAT_WS_AUTH_STATELESS = False  # True: trust the token's claims, no user lookup
+
+# Push notification transport ("chat.push.FakePushTransport" to send nothing)
+PUSH_NOTIFICATION_TRANSPORT = "chat.push.FirebasePushTransport"
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -55,6 +100,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'backend',
     'auth_api',
     'rest_framework',
@@ -121,10 +167,13 @@ ROOT_URLCONF = 'sindhuura.urls'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'auth_api.authentication.CachedJWTAuthentication',
     ),
 }
 
+# Request user cache (see auth_api/user_cache.py)
+AUTH_USER_CACHE_TTL = 300  # seconds
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -214,6 +263,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  # For collectstatic command
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Gallery uploads (see auth_api/uploads.py)
+USER_IMAGE_UPLOAD_MAX_FILES = 10  # per request
+USER_IMAGE_MAX_SIZE = 10 * 1024 * 1024  # bytes per file
+USER_IMAGE_MAX_DIMENSION = 8000  # pixels per side
+USER_IMAGE_QUOTA = 20  # images per user
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 